@@ -12,6 +12,8 @@ __email__ = troy.sobotka@gmail.com
 __status__ = Test
 """
 
+import colour
+import memoize
 import numpy
 import working_space
 import PyOpenColorIO
@@ -26,6 +28,7 @@ def shape_OCIO_matrix(numpy_matrix):
     return ocio_matrix
 
 
+@memoize.memoize()
 def AgX_create_colourspace(
     primaries_rotate=[1.75, -0.5, -1.0],
     primaries_scale=[0.15, 0.15, 0.10],
@@ -44,6 +47,20 @@ def AgX_create_colourspace(
     return colourspace_destination
 
 
+# Memoized colour.matrix_RGB_to_RGB.
+@memoize.memoize()
+def calculate_matrix_RGB_to_RGB(
+    input_colourspace,
+    output_colourspace,
+    chromatic_adaptation_transform="CAT02",
+):
+    return colour.matrix_RGB_to_RGB(
+        input_colourspace,
+        output_colourspace,
+        chromatic_adaptation_transform=chromatic_adaptation_transform,
+    )
+
+
 def as_numeric(obj, as_type=numpy.float64):
     try:
         return as_type(obj)
@@ -157,27 +174,104 @@ def equation_curve(x, x_pivot, y_pivot, slope_pivot, power, scale):
     return curve
 
 
-def equation_full_curve(x, x_pivot, y_pivot, slope_pivot, power):
-    x = numpy.asarray(x)
-    x_pivot = numpy.tile(numpy.asarray(x_pivot), len(x))
-    y_pivot = numpy.tile(numpy.asarray(y_pivot), len(x))
-    slope_pivot = numpy.tile(numpy.asarray(slope_pivot), len(x))
-    power = numpy.tile(numpy.asarray(power), len(x))
+# Give per curve parameters trailing axes so that they broadcast against every
+# axis of x. Scalars broadcast as is, while vectors of K parameters yield K
+# curves stacked along the leading axis of the output.
+def as_curve_parameter(parameter, x):
+    parameter = numpy.asarray(parameter, dtype=numpy.float64)
 
-    scale_x_pivot = numpy.where(x >= x_pivot, 1.0 - x_pivot, x_pivot)
+    return parameter.reshape(parameter.shape + (1,) * x.ndim)
 
-    scale_y_pivot = numpy.where(x >= x_pivot, 1.0 - y_pivot, y_pivot)
 
-    toe_scale = equation_scale(
-        scale_x_pivot, scale_y_pivot, slope_pivot, power[..., 0]
-    )
+def calculate_curve_scales(x_pivot, y_pivot, slope_pivot, power):
+    toe_scale = -equation_scale(x_pivot, y_pivot, slope_pivot, power[0])
     shoulder_scale = equation_scale(
-        scale_x_pivot, scale_y_pivot, slope_pivot, power[..., 1]
+        1.0 - x_pivot, 1.0 - y_pivot, slope_pivot, power[1]
     )
 
-    scale = numpy.where(x >= x_pivot, shoulder_scale, -toe_scale)
+    return toe_scale, shoulder_scale
 
-    return equation_curve(x, x_pivot, y_pivot, slope_pivot, power, scale)
+
+def equation_full_curve(x, x_pivot, y_pivot, slope_pivot, power, out=None):
+    x = numpy.asarray(x)
+    x_pivot = as_curve_parameter(x_pivot, x)
+    y_pivot = as_curve_parameter(y_pivot, x)
+    slope_pivot = as_curve_parameter(slope_pivot, x)
+    power = numpy.moveaxis(numpy.asarray(power), -1, 0)
+    power = [as_curve_parameter(power[0], x), as_curve_parameter(power[1], x)]
+
+    # The scales are per curve values and never span the samples.
+    scales = calculate_curve_scales(x_pivot, y_pivot, slope_pivot, power)
+
+    shape = numpy.broadcast_shapes(
+        x.shape,
+        x_pivot.shape,
+        y_pivot.shape,
+        slope_pivot.shape,
+        scales[0].shape,
+        scales[1].shape,
+    )
+    if out is None:
+        out = numpy.empty(shape, dtype=numpy.float64)
+
+    region_shoulder = x >= x_pivot
+    regions = [~region_shoulder, region_shoulder]
+
+    # Evaluate x / (1 + x^p)^(1/p) as (x^-p + 1)^(-1/p), which holds for the
+    # positive terms on either side of the pivot and runs entirely in place.
+    numpy.subtract(x, x_pivot, out=out)
+    for region, scale, curve_power in zip(regions, scales, power):
+        numpy.multiply(out, slope_pivot / scale, out=out, where=region)
+        with numpy.errstate(divide="ignore", over="ignore"):
+            numpy.power(out, -curve_power, out=out, where=region)
+        numpy.add(out, 1.0, out=out, where=region)
+        numpy.power(out, -1.0 / curve_power, out=out, where=region)
+        numpy.multiply(out, scale, out=out, where=region)
+    numpy.add(out, y_pivot, out=out)
+
+    return out
+
+
+# Closed form inverse of equation_full_curve. Each side of the pivot inverts
+# the hyperbolic in isolation as (y^-p - 1)^(-1/p), returning NaN beyond the
+# asymptotes.
+def equation_full_curve_inverse(
+    y, x_pivot, y_pivot, slope_pivot, power, out=None
+):
+    y = numpy.asarray(y)
+    x_pivot = as_curve_parameter(x_pivot, y)
+    y_pivot = as_curve_parameter(y_pivot, y)
+    slope_pivot = as_curve_parameter(slope_pivot, y)
+    power = numpy.moveaxis(numpy.asarray(power), -1, 0)
+    power = [as_curve_parameter(power[0], y), as_curve_parameter(power[1], y)]
+
+    scales = calculate_curve_scales(x_pivot, y_pivot, slope_pivot, power)
+
+    shape = numpy.broadcast_shapes(
+        y.shape,
+        x_pivot.shape,
+        y_pivot.shape,
+        slope_pivot.shape,
+        scales[0].shape,
+        scales[1].shape,
+    )
+    if out is None:
+        out = numpy.empty(shape, dtype=numpy.float64)
+
+    region_shoulder = y >= y_pivot
+    regions = [~region_shoulder, region_shoulder]
+
+    numpy.subtract(y, y_pivot, out=out)
+    for region, scale, curve_power in zip(regions, scales, power):
+        numpy.divide(out, scale, out=out, where=region)
+        with numpy.errstate(divide="ignore", over="ignore", invalid="ignore"):
+            numpy.power(out, -curve_power, out=out, where=region)
+            numpy.subtract(out, 1.0, out=out, where=region)
+            numpy.power(out, -1.0 / curve_power, out=out, where=region)
+        numpy.multiply(out, scale / slope_pivot, out=out, where=region)
+    numpy.add(out, x_pivot, out=out)
+
+    return out
 
 
 def add_view(in_dict, display, view_name, view_transform):
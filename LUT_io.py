@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""LUT_io
+
+Write 1D and 3D LUTs as Sony SPI1D, Sony SPI3D, Iridas / Resolve .cube and
+Academy / ASC CLF. The whole table is formatted by a single string format
+operation and written at once, rather than value by value, producing the same
+bytes as the corresponding Colour writers.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import numpy
+
+# Decimal places of the LUT values, as Colour writes them.
+LUT_decimals = 7
+
+
+# Format every row of a two dimensional table through the row format in one
+# pass.
+def format_rows(table, row_format):
+    table = numpy.asarray(table)
+
+    return (row_format * len(table)) % tuple(table.ravel().tolist())
+
+
+def create_row_format(columns, decimals=LUT_decimals, prefix=""):
+    return prefix + " ".join(["%.{}f".format(decimals)] * columns) + "\n"
+
+
+def write_text(path, text):
+    with open(path, "w") as write_file:
+        write_file.write(text)
+
+
+def format_comments(comments):
+    return "".join("# {}\n".format(comment) for comment in comments or [])
+
+
+# A 1D table of shape (size,) or a 3x1D table of shape (size, 3) over the
+# given domain.
+def write_SPI1D(
+    path, table, domain=(0.0, 1.0), comments=None, decimals=LUT_decimals
+):
+    table = numpy.asarray(table)
+    columns = 1 if table.ndim == 1 else 3
+
+    write_text(
+        path,
+        "Version 1\n"
+        "From {}"
+        "Length {}\n"
+        "Components {}\n"
+        "{{\n"
+        "{}"
+        "}}\n"
+        "{}".format(
+            format_rows([domain], create_row_format(2, decimals)),
+            len(table),
+            columns,
+            format_rows(
+                table.reshape(-1, columns),
+                create_row_format(columns, decimals, prefix=" "),
+            ),
+            format_comments(comments),
+        ),
+    )
+
+
+# A 3D table of shape (size, size, size, 3), indexed on red, green and blue,
+# over the unit cube.
+def write_SPI3D(path, table, comments=None, decimals=LUT_decimals):
+    table = numpy.asarray(table)
+    size = table.shape[0]
+
+    # Each row leads with the red, green and blue lattice indices, with blue
+    # varying fastest.
+    indices = numpy.indices((size, size, size)).reshape(3, -1).T
+
+    write_text(
+        path,
+        "SPILUT 1.0\n"
+        "3 3\n"
+        "{0} {0} {0}\n"
+        "{1}"
+        "{2}".format(
+            size,
+            format_rows(
+                numpy.hstack([indices, table.reshape(-1, 3)]),
+                "%d %d %d " + create_row_format(3, decimals),
+            ),
+            format_comments(comments),
+        ),
+    )
+
+
+# A 1D table of shape (size,), a 3x1D table of shape (size, 3) or a 3D table
+# of shape (size, size, size, 3), indexed on red, green and blue. A domain
+# other than the unit cube is given as the minimum and maximum rows.
+def write_cube(
+    path,
+    table,
+    title="",
+    domain=None,
+    comments=None,
+    decimals=LUT_decimals,
+):
+    table = numpy.asarray(table)
+
+    if table.ndim == 4:
+        size_keyword = "LUT_3D_SIZE"
+        # Red varies fastest in .cube files.
+        rows = numpy.transpose(table, (2, 1, 0, 3)).reshape(-1, 3)
+    else:
+        size_keyword = "LUT_1D_SIZE"
+        rows = table.reshape(len(table), -1)
+        if rows.shape[1] == 1:
+            rows = numpy.repeat(rows, 3, axis=1)
+
+    domain_text = ""
+    if domain is not None and not numpy.array_equal(
+        numpy.asarray(domain), [[0, 0, 0], [1, 1, 1]]
+    ):
+        domain_text = "DOMAIN_MIN {}DOMAIN_MAX {}".format(
+            *(
+                format_rows([row], create_row_format(3, decimals))
+                for row in numpy.asarray(domain)
+            )
+        )
+
+    write_text(
+        path,
+        'TITLE "{}"\n'
+        "{}"
+        "{} {}\n"
+        "{}"
+        "{}".format(
+            title,
+            format_comments(comments),
+            size_keyword,
+            table.shape[0],
+            domain_text,
+            format_rows(rows, create_row_format(3, decimals)),
+        ),
+    )
+
+
+# A CLF process list of a single LUT, a LUT1D of a table of shape (size,) or
+# (size, 3), or a LUT3D of a table of shape (size, size, size, 3) indexed on
+# red, green and blue.
+def write_CLF(path, table, name="", decimals=LUT_decimals):
+    import xml.sax.saxutils
+
+    table = numpy.asarray(table)
+
+    if table.ndim == 4:
+        element = "LUT3D"
+        dimensions = "{0} {0} {0} 3".format(table.shape[0])
+        columns = 3
+    else:
+        element = "LUT1D"
+        columns = 1 if table.ndim == 1 else 3
+        dimensions = "{} {}".format(len(table), columns)
+
+    write_text(
+        path,
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ProcessList compCLFversion="3" id="{0}" name="{0}">\n'
+        '    <{1} inBitDepth="32f" outBitDepth="32f">\n'
+        '        <Array dim="{2}">\n'
+        "{3}"
+        "        </Array>\n"
+        "    </{1}>\n"
+        "</ProcessList>\n".format(
+            xml.sax.saxutils.escape(name, {'"': "&quot;"}),
+            element,
+            dimensions,
+            format_rows(
+                table.reshape(-1, columns),
+                create_row_format(columns, decimals),
+            ),
+        ),
+    )
+
+
+LUT_writers = {
+    "spi1d": write_SPI1D,
+    "spi3d": write_SPI3D,
+    "cube": write_cube,
+    "clf": write_CLF,
+}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""bake_LUTs
+
+Bake each AgX view of a configuration into a single 3D LUT for tools that
+cannot load a configuration. The lattice is sampled in the AgX Log encoding
+by default, so that the LUT covers the full scene range, and is evaluated in
+chunks across threads. The .cube and .spi3d LUTs take AgX Log encoded input.
+The CLF LUTs carry the log shaper ahead of the lattice, and so take
+open domain linear BT.709 input.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import concurrent.futures
+import os
+import pathlib
+import numpy
+
+default_views = ["AgX Base", "AgX Base BT.1886", "AgX Base Display P3"]
+default_sizes = [33, 65]
+default_formats = ["cube", "spi3d", "clf"]
+
+lattice_colourspace = "AgX Log (SB2383)"
+shaper_colourspace = "Linear BT.709"
+
+# Lattice points evaluated per chunk.
+chunk_points = 2**16
+
+
+# A lattice of shape (size, size, size, 3) over the unit cube, indexed on
+# red, green and blue, with blue varying fastest when flattened.
+def create_lattice(size):
+    samples = numpy.linspace(0.0, 1.0, size, dtype=numpy.float32)
+
+    return numpy.stack(
+        numpy.meshgrid(samples, samples, samples, indexing="ij"), axis=-1
+    )
+
+
+# Evaluate the processor over a copy of the lattice, in chunks spread across
+# threads.
+def evaluate_lattice(processor, lattice, jobs=None):
+    evaluated = numpy.array(lattice, dtype=numpy.float32)
+    points = evaluated.reshape(-1, 3)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for _ in executor.map(
+            processor.applyRGB,
+            [
+                points[start : start + chunk_points]  # noqa: E203
+                for start in range(0, len(points), chunk_points)
+            ],
+        ):
+            pass
+
+    return evaluated
+
+
+def LUT_filename(view, size, LUT_format):
+    return "{}_{}.{}".format(view.replace(" ", "_"), size, LUT_format)
+
+
+def write_LUT(config, view, table, path, LUT_format):
+    import build_cache
+
+    if LUT_format == "clf":
+        import PyOpenColorIO
+
+        size = table.shape[0]
+        lattice = PyOpenColorIO.Lut3DTransform(gridSize=size)
+        lattice.setData(numpy.ascontiguousarray(table).ravel())
+        group = PyOpenColorIO.GroupTransform(
+            [
+                PyOpenColorIO.ColorSpaceTransform(
+                    src=shaper_colourspace, dst=lattice_colourspace
+                ),
+                lattice,
+            ]
+        )
+        group.getFormatMetadata().setName(
+            "{} {}^3, {} input".format(view, size, shaper_colourspace)
+        )
+        text = group.write(
+            formatName="Academy/ASC Common LUT Format", config=config
+        )
+
+        def writer(temporary):
+            with open(temporary, "w") as write_file:
+                write_file.write(text)
+
+    elif LUT_format == "cube":
+        import LUT_io
+
+        def writer(temporary):
+            LUT_io.write_cube(
+                temporary,
+                table,
+                title="{} {}^3, {} input".format(
+                    view, table.shape[0], lattice_colourspace
+                ),
+            )
+
+    else:
+        import LUT_io
+
+        def writer(temporary):
+            LUT_io.write_SPI3D(temporary, table)
+
+    build_cache.write_file_atomic(path, writer)
+
+
+# Bake every view at every lattice size into every format, returning the
+# written files relative to the output directory. The configuration must be
+# able to resolve its LUT files, as one read from disk or with its working
+# directory set.
+def bake_config(
+    config,
+    output_directory,
+    views=default_views,
+    sizes=default_sizes,
+    formats=default_formats,
+    jobs=None,
+):
+    for LUT_format in formats:
+        if LUT_format not in default_formats:
+            raise ValueError("Unknown LUT format {}.".format(LUT_format))
+
+    output_directory = pathlib.Path(output_directory)
+    processors = {
+        view: config.getProcessor(
+            lattice_colourspace, view
+        ).getDefaultCPUProcessor()
+        for view in views
+    }
+
+    files = []
+    for size in sizes:
+        lattice = create_lattice(size)
+        for view, processor in processors.items():
+            table = evaluate_lattice(processor, lattice, jobs)
+            for LUT_format in formats:
+                filename = LUT_filename(view, size, LUT_format)
+                write_LUT(
+                    config,
+                    view,
+                    table,
+                    output_directory / filename,
+                    LUT_format,
+                )
+                files.append(filename)
+
+    return files
+
+
+if __name__ == "__main__":
+    import time
+    import PyOpenColorIO
+
+    argparser = argparse.ArgumentParser(
+        description="Bakes the AgX views of a configuration into 3D LUTs",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "-c",
+        "--config",
+        help="Configuration to bake",
+        default="./config/config.ocio",
+    )
+    argparser.add_argument(
+        "-o",
+        "--output_directory",
+        help="Directory to write the LUTs to",
+        default="./baked/",
+    )
+    argparser.add_argument(
+        "-v", "--views", help="Views to bake", nargs="+", default=default_views
+    )
+    argparser.add_argument(
+        "-s",
+        "--sizes",
+        help="Lattice sizes",
+        type=int,
+        nargs="+",
+        default=default_sizes,
+    )
+    argparser.add_argument(
+        "-f",
+        "--formats",
+        help="LUT formats",
+        nargs="+",
+        choices=default_formats,
+        default=default_formats,
+    )
+    argparser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of threads evaluating the lattice",
+        type=int,
+        default=os.cpu_count(),
+    )
+    args = argparser.parse_args()
+
+    start = time.perf_counter()
+    files = bake_config(
+        PyOpenColorIO.Config.CreateFromFile(args.config),
+        args.output_directory,
+        views=args.views,
+        sizes=args.sizes,
+        formats=args.formats,
+        jobs=args.jobs,
+    )
+    print(
+        "Baked {} LUTs in {:.2f} s".format(
+            len(files), time.perf_counter() - start
+        )
+    )
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""benchmark_LUT_io
+
+Compare the LUT_io writers against colour.io.write_LUT, timing both on the
+same tables and checking that they write identical bytes.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import filecmp
+import pathlib
+import statistics
+import tempfile
+import time
+import numpy
+
+
+def time_writer(writer, path, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        writer(path)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+# Each case is a table, the Colour LUT and method writing it, and the LUT_io
+# writer expected to write the same bytes.
+def create_cases(sizes_1D, sizes_3D):
+    import colour
+    import LUT_io
+
+    generator = numpy.random.default_rng(0)
+    cases = {}
+
+    for size in sizes_1D:
+        table = generator.uniform(0.0, 1.0, size)
+        cases["SPI1D {}".format(size)] = (
+            ".spi1d",
+            lambda path, LUT=colour.LUT1D(table, "Benchmark"): (
+                colour.io.write_LUT(LUT, path, method="Sony SPI1D")
+            ),
+            lambda path, table=table: LUT_io.write_SPI1D(path, table),
+        )
+
+    for size in sizes_3D:
+        table = generator.uniform(0.0, 1.0, (size, size, size, 3))
+        LUT = colour.LUT3D(table, "Benchmark")
+        cases["SPI3D {}^3".format(size)] = (
+            ".spi3d",
+            lambda path, LUT=LUT: colour.io.write_LUT(
+                LUT, path, method="Sony SPI3D"
+            ),
+            lambda path, table=table: LUT_io.write_SPI3D(path, table),
+        )
+        cases["cube {}^3".format(size)] = (
+            ".cube",
+            lambda path, LUT=LUT: colour.io.write_LUT(
+                LUT, path, method="Iridas Cube"
+            ),
+            lambda path, table=table: LUT_io.write_cube(
+                path, table, title="Benchmark"
+            ),
+        )
+
+    return cases
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Benchmarks the LUT_io writers against Colour",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "-r", "--repeats", help="Number of timed writes", type=int, default=3
+    )
+    argparser.add_argument(
+        "-1",
+        "--sizes_1D",
+        help="Sizes of the 1D LUTs",
+        type=int,
+        nargs="+",
+        default=[4096, 65536],
+    )
+    argparser.add_argument(
+        "-3",
+        "--sizes_3D",
+        help="Sizes of the 3D LUTs",
+        type=int,
+        nargs="+",
+        default=[33, 65],
+    )
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        for name, (suffix, colour_writer, LUT_io_writer) in create_cases(
+            args.sizes_1D, args.sizes_3D
+        ).items():
+            colour_path = directory / ("colour" + suffix)
+            LUT_io_path = directory / ("LUT_io" + suffix)
+            colour_time = statistics.median(
+                time_writer(colour_writer, colour_path, args.repeats)
+            )
+            LUT_io_time = statistics.median(
+                time_writer(LUT_io_writer, LUT_io_path, args.repeats)
+            )
+            print(
+                "{:<14} colour {:8.1f} ms, LUT_io {:8.1f} ms, {:5.1f}x, "
+                "{}".format(
+                    name,
+                    colour_time * 1000.0,
+                    LUT_io_time * 1000.0,
+                    colour_time / LUT_io_time,
+                    "identical"
+                    if filecmp.cmp(colour_path, LUT_io_path, shallow=False)
+                    else "DIFFERENT",
+                )
+            )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""benchmark_imports
+
+Track the cold start cost of generate_config. Each case runs in a fresh
+interpreter, so that the import cost is paid on every repeat.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+repository_directory = pathlib.Path(__file__).resolve().parent
+
+benchmark_cases = {
+    "import generate_config": ["-c", "import generate_config"],
+    "generate_config.py --help": ["generate_config.py", "--help"],
+    "import generate_config, build_config": [
+        "-c",
+        "import generate_config; generate_config.build_config({})",
+    ],
+    "import colour": ["-c", "import colour"],
+    "import PyOpenColorIO": ["-c", "import PyOpenColorIO"],
+    "interpreter": ["-c", "pass"],
+}
+
+
+def time_case(arguments, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + arguments,
+            cwd=repository_directory,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+# List the modules that importing generate_config pulls in, to catch heavy
+# imports creeping back to module level.
+def eager_modules():
+    heavy_modules = ["numpy", "colour", "PyOpenColorIO", "shapely"]
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, generate_config; "
+            "print(' '.join(m for m in {} if m in sys.modules))".format(
+                heavy_modules
+            ),
+        ],
+        cwd=repository_directory,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return result.stdout.split()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Benchmarks the cold start time of generate_config",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "-r",
+        "--repeats",
+        help="Number of fresh interpreters to time for each case",
+        type=int,
+        default=10,
+    )
+    args = argparser.parse_args()
+
+    for name, arguments in benchmark_cases.items():
+        timings = time_case(arguments, args.repeats)
+        print(
+            "{:<40} median {:8.1f} ms, min {:8.1f} ms".format(
+                name,
+                statistics.median(timings) * 1000.0,
+                min(timings) * 1000.0,
+            )
+        )
+
+    print(
+        "Heavy modules imported by generate_config: {}".format(
+            ", ".join(eager_modules()) or "none"
+        )
+    )
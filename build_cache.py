@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""build_cache
+
+Content addressed cache of generated configurations, along with atomic
+writing that leaves byte identical files untouched.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import filecmp
+import hashlib
+import importlib.metadata
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+
+# Bump to invalidate every existing cache entry.
+generator_version = "1.0"
+
+# The modules whose source determines the generated output.
+source_modules = [
+    "generate_config.py",
+    "AgX.py",
+    "sigmoid.py",
+    "working_space.py",
+    "LUT_io.py",
+]
+
+# The distributions whose versions determine the generated output.
+source_distributions = ["colour-science", "opencolorio", "numpy"]
+
+manifest_name = "manifest.json"
+
+# Temporary files are created private, so apply the process umask to them as
+# a regular open would.
+process_umask = os.umask(0o022)
+os.umask(process_umask)
+file_mode = 0o666 & ~process_umask
+
+
+# Reduce parameters to a canonical JSON form, with floats keyed on their
+# exact hexadecimal representation.
+def normalize_parameter(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value + 0.0).hex()
+    if isinstance(value, (list, tuple)):
+        return [normalize_parameter(item) for item in value]
+
+    raise TypeError(
+        "Cannot normalize parameter of type {}.".format(type(value).__name__)
+    )
+
+
+# Digest of everything other than the parameters that determines the
+# generated output.
+def calculate_source_digest():
+    digest = hashlib.sha256()
+    digest.update(generator_version.encode("utf-8"))
+
+    source_directory = pathlib.Path(__file__).resolve().parent
+    for module in source_modules:
+        digest.update(module.encode("utf-8"))
+        digest.update((source_directory / module).read_bytes())
+
+    for distribution in source_distributions:
+        try:
+            version = importlib.metadata.version(distribution)
+        except importlib.metadata.PackageNotFoundError:
+            version = None
+        digest.update("{}={}".format(distribution, version).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def calculate_build_key(params):
+    digest = hashlib.sha256()
+    digest.update(calculate_source_digest().encode("utf-8"))
+
+    normalized = {key: normalize_parameter(params[key]) for key in params}
+    digest.update(json.dumps(normalized, sort_keys=True).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def files_identical(path_a, path_b):
+    try:
+        return filecmp.cmp(path_a, path_b, shallow=False)
+    except OSError:
+        return False
+
+
+# Write a file through a temporary sibling that is moved into place, so that
+# readers never observe a partial file. The writer receives the temporary
+# path. Should the result be byte identical to the existing file, the
+# existing file is kept untouched and False is returned.
+def write_file_atomic(path, writer):
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    handle, temporary = tempfile.mkstemp(
+        dir=path.parent, prefix=".{}.".format(path.name), suffix=path.suffix
+    )
+    os.close(handle)
+    try:
+        writer(temporary)
+        os.chmod(temporary, file_mode)
+        if files_identical(temporary, path):
+            os.unlink(temporary)
+            return False
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+    return True
+
+
+# Hardlink a file into place, falling back to a copy across file systems.
+def link_file(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+# Restore the cache entry for the key into the output directory, returning
+# the restored files, or None when there is no entry.
+def restore(cache_directory, key, output_directory):
+    entry = pathlib.Path(cache_directory) / key
+    try:
+        with open(entry / manifest_name) as read_file:
+            files = json.load(read_file)
+    except (OSError, ValueError):
+        return None
+
+    def link_writer(source):
+        def writer(temporary):
+            os.unlink(temporary)
+            link_file(source, temporary)
+
+        return writer
+
+    output_directory = pathlib.Path(output_directory)
+    for filename in files:
+        write_file_atomic(
+            output_directory / filename, link_writer(entry / filename)
+        )
+
+    return files
+
+
+# Store the given files, relative to the output directory, as the cache entry
+# for the key. The entry is assembled aside and renamed into place, with the
+# manifest marking it complete.
+def store(cache_directory, key, output_directory, files):
+    cache_directory = pathlib.Path(cache_directory)
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    entry = cache_directory / key
+    if entry.exists():
+        return entry
+
+    output_directory = pathlib.Path(output_directory)
+    staging = pathlib.Path(
+        tempfile.mkdtemp(dir=cache_directory, prefix=".{}.".format(key))
+    )
+    os.chmod(staging, 0o777 & ~process_umask)
+    try:
+        for filename in files:
+            (staging / filename).parent.mkdir(parents=True, exist_ok=True)
+            link_file(output_directory / filename, staging / filename)
+        with open(staging / manifest_name, "w") as write_file:
+            json.dump(sorted(files), write_file)
+        os.rename(staging, entry)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Another process may have stored the same entry concurrently.
+        if not (entry / manifest_name).exists():
+            raise
+
+    return entry
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""distributed_sweep
+
+Split a parameter sweep into shards of work units on a queue, so that several
+machines may build them independently, and merge the completed units into a
+single manifest. Every unit is a full configuration build, optionally along
+with the evaluation of each AgX view over a lattice.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import concurrent.futures
+import json
+import pathlib
+import socket
+import time
+import traceback
+import sweep
+import work_queue
+
+# The colourspace lattices are sampled in, spanning the full scene range of
+# the AgX views over the unit cube.
+lattice_colourspace = "AgX Log (SB2383)"
+lattice_view = "AgX"
+
+
+# Units are named on a digest of their parameters, so that the units of
+# separate sweeps enqueued on the same queue never collide, while a variant
+# repeated across sweeps is only built once.
+def calculate_unit_name(params):
+    import hashlib
+    import build_cache
+
+    normalized = {
+        key: build_cache.normalize_parameter(value)
+        for key, value in params.items()
+    }
+
+    return "variant_{}".format(
+        hashlib.sha256(
+            json.dumps(normalized, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+    )
+
+
+def create_units(variants, shards):
+    return [
+        {
+            "name": calculate_unit_name(params),
+            "shard": index % shards,
+            "parameters": params,
+        }
+        for index, params in enumerate(variants)
+    ]
+
+
+# Evaluate the AgX view of each display over a lattice of the given size,
+# returning an array of shape (size, size, size, 3) per display, indexed on
+# red, green and blue.
+def evaluate_lattice(config, size):
+    import PyOpenColorIO
+    import numpy
+
+    samples = numpy.linspace(0.0, 1.0, size, dtype=numpy.float32)
+    lattice = numpy.stack(
+        numpy.meshgrid(samples, samples, samples, indexing="ij"), axis=-1
+    )
+
+    lattices = {}
+    for display in config.getDisplays():
+        processor = config.getProcessor(
+            lattice_colourspace,
+            display,
+            lattice_view,
+            PyOpenColorIO.TRANSFORM_DIR_FORWARD,
+        ).getDefaultCPUProcessor()
+
+        evaluated = lattice.copy()
+        processor.applyRGB(evaluated)
+        lattices[display] = evaluated
+
+    return lattices
+
+
+def write_lattices(lattices, output_directory):
+    import numpy
+    import build_cache
+
+    files = []
+    for display, lattice in lattices.items():
+        filename = "lattice_{}_{}.npy".format(
+            display.replace(" ", "_"), lattice_view
+        )
+        build_cache.write_file_atomic(
+            pathlib.Path(output_directory) / filename,
+            lambda temporary: numpy.save(temporary, lattice),
+        )
+        files.append(filename)
+
+    return files
+
+
+def build_unit(unit, output_directory, lattice_size=None):
+    import generate_config
+
+    config, luts = generate_config.build_config(unit["parameters"])
+    unit_directory = pathlib.Path(output_directory) / unit["name"]
+    files = generate_config.write_config(
+        config, luts, output_directory=unit_directory, verbose=False
+    )
+    if lattice_size is not None:
+        # Resolve the LUT search paths against the written configuration.
+        config.setWorkingDir(str(unit_directory.resolve()))
+        files += write_lattices(
+            evaluate_lattice(config, lattice_size), unit_directory
+        )
+
+    return {"output": unit["name"], "files": files}
+
+
+# Worker names are stable across restarts, so that a restarted worker
+# reclaims the units it held. Workers sharing a host and a shard must be given
+# names of their own, or be run as the jobs of a single worker.
+def default_worker_name(shard=None):
+    if shard is None:
+        return socket.gethostname()
+
+    return "{}-shard-{}".format(socket.gethostname(), shard)
+
+
+# Lease and build units until the queue, or the shard, runs dry. A worker
+# restarting under the same name first returns the units it held, so that
+# they are rebuilt rather than waiting on their lease to expire. Returns the
+# number of units built.
+def run_worker(
+    queue_location,
+    output_directory,
+    shard=None,
+    worker=None,
+    lattice_size=None,
+    lease_seconds=600.0,
+    verbose=False,
+):
+    queue = work_queue.open_queue(queue_location)
+    worker = worker or default_worker_name(shard)
+    queue.release(worker)
+
+    built = 0
+    try:
+        while True:
+            unit = queue.lease(
+                worker, shard=shard, lease_seconds=lease_seconds
+            )
+            if unit is None:
+                break
+
+            try:
+                result = build_unit(unit, output_directory, lattice_size)
+            except Exception:
+                queue.fail(unit["name"], worker, traceback.format_exc())
+                if verbose is True:
+                    print('Failed "{}"'.format(unit["name"]))
+                continue
+
+            # A unit whose lease was lost has been handed to another worker,
+            # so its result is discarded.
+            if queue.complete(unit["name"], worker, result):
+                built += 1
+                if verbose is True:
+                    print('Built "{}" on {}'.format(unit["name"], worker))
+            elif verbose is True:
+                print(
+                    'Discarded "{}", its lease was lost'.format(unit["name"])
+                )
+    finally:
+        queue.close()
+
+    return built
+
+
+# Run several workers on this machine, each in its own process.
+def run_workers(queue_location, output_directory, jobs, **kwargs):
+    worker = kwargs.pop("worker", None) or default_worker_name(
+        kwargs.get("shard")
+    )
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=sweep.initialize_worker
+    ) as executor:
+        futures = [
+            executor.submit(
+                run_worker,
+                queue_location,
+                output_directory,
+                worker="{}-{}".format(worker, index),
+                **kwargs
+            )
+            for index in range(jobs)
+        ]
+
+        return sum(future.result() for future in futures)
+
+
+# Merge the completed units into a single manifest, in the same form as that
+# of sweep.run_sweep. Units yet to complete are left out.
+def merge(queue_location, output_directory):
+    queue = work_queue.open_queue(queue_location)
+    try:
+        manifest = {
+            unit["name"]: {
+                "parameters": unit["parameters"],
+                "shard": unit["shard"],
+                "worker": unit["worker"],
+                **unit["result"],
+            }
+            for unit in queue.units()
+            if unit["state"] == work_queue.unit_completed
+        }
+        progress = queue.progress()
+    finally:
+        queue.close()
+
+    sweep.write_manifest(manifest, output_directory)
+
+    return manifest, progress
+
+
+def print_progress(progress):
+    print(
+        ", ".join(
+            "{} {}".format(count, state) for state, count in progress.items()
+        )
+    )
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Runs a parameter sweep as shards of work units on a "
+        "queue, shared between any number of workers",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "-q",
+        "--queue",
+        help="Work queue location, such as sqlite:///path/to/queue.sqlite "
+        "or a plain SQLite database path",
+        default="sweep_queue.sqlite",
+    )
+    subparsers = argparser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser(
+        "enqueue", help="Add the variants of a sweep description to the queue"
+    )
+    enqueue_parser.add_argument("sweep", help="JSON sweep description")
+    enqueue_parser.add_argument(
+        "-s", "--shards", help="Number of shards", type=int, default=1
+    )
+
+    work_parser = subparsers.add_parser(
+        "work", help="Build units from the queue until none remain"
+    )
+    work_parser.add_argument(
+        "-o",
+        "--output_directory",
+        help="Directory to write each variant to",
+        default="./sweep/",
+    )
+    work_parser.add_argument(
+        "-s", "--shard", help="Only build units of this shard", type=int
+    )
+    work_parser.add_argument(
+        "-w",
+        "--worker",
+        help="Worker name, defaulting to the host and shard. Workers sharing "
+        "a host and shard need names of their own",
+    )
+    work_parser.add_argument(
+        "-j", "--jobs", help="Number of worker processes", type=int, default=1
+    )
+    work_parser.add_argument(
+        "-l",
+        "--lattice_size",
+        help="Also evaluate each AgX view over a lattice of this size",
+        type=int,
+    )
+    work_parser.add_argument(
+        "-ls",
+        "--lease_seconds",
+        help="Seconds before a leased unit returns to the queue",
+        type=float,
+        default=600.0,
+    )
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="Merge the completed units into a single manifest"
+    )
+    merge_parser.add_argument(
+        "-o",
+        "--output_directory",
+        help="Directory to write the manifest to",
+        default="./sweep/",
+    )
+
+    subparsers.add_parser("status", help="Report the progress of the queue")
+    subparsers.add_parser("retry", help="Return failed units to the queue")
+
+    args = argparser.parse_args()
+
+    if args.command == "enqueue":
+        with open(args.sweep) as read_file:
+            variants = sweep.expand_sweep(json.load(read_file))
+        queue = work_queue.open_queue(args.queue)
+        queue.put(create_units(variants, args.shards))
+        print_progress(queue.progress())
+        queue.close()
+    elif args.command == "work":
+        start = time.perf_counter()
+        parameters = {
+            "shard": args.shard,
+            "worker": args.worker,
+            "lattice_size": args.lattice_size,
+            "lease_seconds": args.lease_seconds,
+            "verbose": True,
+        }
+        if args.jobs > 1:
+            built = run_workers(
+                args.queue, args.output_directory, args.jobs, **parameters
+            )
+        else:
+            sweep.initialize_worker()
+            built = run_worker(args.queue, args.output_directory, **parameters)
+        print(
+            "Built {} units in {:.2f} s".format(
+                built, time.perf_counter() - start
+            )
+        )
+    elif args.command == "merge":
+        manifest, progress = merge(args.queue, args.output_directory)
+        print("Merged {} units".format(len(manifest)))
+        print_progress(progress)
+    elif args.command == "status":
+        queue = work_queue.open_queue(args.queue)
+        print_progress(queue.progress())
+        queue.close()
+    elif args.command == "retry":
+        queue = work_queue.open_queue(args.queue)
+        queue.retry_failed()
+        print_progress(queue.progress())
+        queue.close()
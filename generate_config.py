@@ -12,13 +12,11 @@ __email__ = troy.sobotka@gmail.com
 __status__ = Test
 """
 
-import PyOpenColorIO
+# Only lightweight modules are imported here. Colour, OpenColorIO, NumPy and
+# the AgX modules that depend upon them are imported by the stages that use
+# them, so that --help and cached builds do not pay for them.
 import argparse
-import numpy
-import colour
 import pathlib
-import AgX
-import sigmoid
 
 ####
 # Global Configuration Variables
@@ -27,6 +25,56 @@ output_config_directory = "./config/"
 output_config_name = "config.ocio"
 output_LUTs_directory = "./LUTs/"
 LUT_search_paths = ["LUTs"]
+default_LUT_size = 4096
+
+# Parameters that do not influence the generated files.
+nonbuild_parameters = [
+    "cache_directory",
+    "build_cache",
+    "stage_directory",
+    "verbose_plotting",
+]
+
+# Parameters that influence only the contrast curve LUTs, those that
+# influence only the working and destination matrices, and those that
+# influence the assembly of the configuration itself.
+curve_parameters = [
+    "fulcrum_input",
+    "fulcrum_output",
+    "fulcrum_slope",
+    "exponent_toe",
+    "exponent_shoulder",
+    "inverse_LUT",
+    "analytic_curve",
+    "LUT_tolerance",
+]
+gamut_parameters = [
+    "primaries_rotate",
+    "primaries_inset",
+    "primaries_outset",
+    "tinting_rotate",
+    "tinting_outset",
+]
+config_parameters = [
+    "limit_low",
+    "limit_high",
+    "inverse_LUT",
+    "analytic_curve",
+]
+# An analytic contrast curve is fitted while assembling the configuration, so
+# the assembly then also depends upon the curve.
+analytic_curve_parameters = [
+    "analytic_tolerance",
+    "fulcrum_input",
+    "fulcrum_output",
+    "fulcrum_slope",
+    "exponent_toe",
+    "exponent_shoulder",
+]
+
+# Samples of the contrast curve domain over which the error of the analytic
+# curve is measured.
+analytic_error_samples = 2**16 + 1
 
 supported_displays = {
     "Display P3": {
@@ -40,7 +88,8 @@ supported_displays = {
     },
 }
 
-if __name__ == "__main__":
+
+def create_argparser():
     #####
     # Parameters
     #####
@@ -62,7 +111,7 @@ if __name__ == "__main__":
     # set of colourimetric ratios. This position is classically considered the
     # "middle" range of the soon-to-be picture / image. Here it is simply set to
     # be the "exposure" zero point of the incoming signal.
-    default_x_pivot = numpy.abs(default_normalized_log2_minimum) / (
+    default_x_pivot = abs(default_normalized_log2_minimum) / (
         default_normalized_log2_maximum - default_normalized_log2_minimum
     )
 
@@ -185,6 +234,63 @@ if __name__ == "__main__":
         type=float,
         default=default_tinting_rotate,
     )
+    argparser.add_argument(
+        "-il",
+        "--inverse_LUT",
+        help="Also write the closed form inverse of the contrast curve and "
+        "use it as the to reference direction of AgX Base, taking AgX Base "
+        "encoded values back to open domain linear BT.709",
+        action="store_true",
+    )
+    argparser.add_argument(
+        "-lt",
+        "--LUT_tolerance",
+        help="Size each contrast curve LUT to the fewest entries whose "
+        "linear interpolation is within this maximum error of the sigmoid, "
+        "rather than {} entries".format(default_LUT_size),
+        type=float,
+        default=None,
+    )
+    argparser.add_argument(
+        "-ac",
+        "--analytic_curve",
+        help="Encode the contrast curve in the configuration itself as a "
+        "spline rather than as a LUT file",
+        action="store_true",
+    )
+    argparser.add_argument(
+        "-at",
+        "--analytic_tolerance",
+        help="Maximum error of the analytic contrast curve against the "
+        "sigmoid. OpenColorIO limits the control points of the curve, so "
+        "tolerances below roughly 1e-5 may be unreachable, in which case the "
+        "most accurate curve is used and a warning given",
+        type=float,
+        default=1e-4,
+    )
+    argparser.add_argument(
+        "-cd",
+        "--cache_directory",
+        help="Directory in which to persist derived colourspaces and matrices "
+        "between runs",
+        default=None,
+    )
+    argparser.add_argument(
+        "-bc",
+        "--build_cache",
+        help="Directory of previously generated configs keyed on a hash of "
+        "the parameters and generator version, restored instead of "
+        "rebuilding when the key matches",
+        default=None,
+    )
+    argparser.add_argument(
+        "-sd",
+        "--stage_directory",
+        help="Directory to persist the intermediate artifacts of each build "
+        "stage in, so that only the stages affected by changed parameters "
+        "are re-run",
+        default=None,
+    )
     argparser.add_argument(
         "-vp",
         "--verbose_plotting",
@@ -193,43 +299,147 @@ if __name__ == "__main__":
         default=False,
     )
 
-    args = argparser.parse_args()
+    return argparser
 
-    config = PyOpenColorIO.Config()
-    description = (
-        "A dangerous picture formation chain designed for Eduardo Suazo and "
-        "Chris Brejon."
-    )
-    config.setDescription(description)
-    config.setMinorVersion(0)
 
-    config.setSearchPath(":".join(LUT_search_paths))
+# The parameters of a build, as would be parsed from an empty command line.
+def default_parameters():
+    return vars(create_argparser().parse_args([]))
 
-    # Establish a displays dictionary to track the displays. Append
-    # the respective display at each of the display colourspace definitions
-    # for clarity.
-    displays = {}
 
-    # Establish a colourspaces dictionary for fetching colourspace objects.
-    colourspaces = {}
+# Resolve parameters given as an argparse namespace or a dictionary keyed on
+# the long option names into a complete namespace, where anything not
+# provided takes its default.
+def resolve_parameters(params):
+    if isinstance(params, argparse.Namespace):
+        params = vars(params)
 
-    ####
-    # Colourspaces
-    ####
+    defaults = default_parameters()
+    unknown = sorted(set(params) - set(defaults))
+    if unknown:
+        raise ValueError("Unknown parameters: {}.".format(", ".join(unknown)))
 
-    # Define a generic tristimulus linear working space, with assumed
-    # BT.709 primaries and a D65 achromatic point.
-    config, colourspace = AgX.add_colourspace(
-        config=config,
-        family="Colourspaces",
-        name="Linear BT.709",
-        description="Open Domain Linear BT.709 Tristimulus",
-        aliases=["Linear", "Linear Tristimulus"],
+    return argparse.Namespace(**{**defaults, **params})
+
+
+# The parameters influencing the assembly of the configuration for the given
+# arguments, leaving out the curve unless it is analytic.
+def select_config_parameters(args):
+    if args.analytic_curve is True:
+        return config_parameters + analytic_curve_parameters
+
+    return config_parameters
+
+
+# Check parameters given as a dictionary keyed on the long option names, as
+# decoded from JSON, against the type and count of values each option takes,
+# raising ValueError on anything resolve_parameters would accept but a build
+# would fail upon.
+def validate_parameters(params):
+    import math
+
+    if not isinstance(params, dict):
+        raise ValueError("Expected parameters as an object.")
+    resolve_parameters(params)
+
+    actions = {action.dest: action for action in create_argparser()._actions}
+    for key, value in params.items():
+        action = actions[key]
+        if value is None and action.default is None:
+            continue
+
+        # Flags take a boolean.
+        if action.nargs == 0 or action.type is bool:
+            if not isinstance(value, bool):
+                raise ValueError("{} must be a boolean.".format(key))
+            continue
+
+        if action.nargs is not None:
+            if not isinstance(value, list) or len(value) != action.nargs:
+                raise ValueError(
+                    "{} must be a list of {} values.".format(key, action.nargs)
+                )
+            values = value
+        else:
+            values = [value]
+
+        for item in values:
+            if action.type is float:
+                valid = (
+                    isinstance(item, (int, float))
+                    and not isinstance(item, bool)
+                    and math.isfinite(item)
+                )
+            else:
+                valid = isinstance(item, str)
+            if not valid:
+                raise ValueError(
+                    "{} must be {}.".format(
+                        key,
+                        "a finite number" if action.type is float else "text",
+                    )
+                )
+
+
+# Assemble the configuration in memory. Returns the configuration along with a
+# dictionary of LUT tables keyed on the file names the configuration
+# references, leaving any writing to write_config.
+def build_config(params, verbose=False):
+    args = resolve_parameters(params)
+
+    matrix_working, matrix_destination = calculate_matrices(args)
+    luts = calculate_LUTs(args)
+    config = assemble_config(
+        args, matrix_working, matrix_destination, verbose=verbose
+    )
+
+    return config, luts
+
+
+# Assemble the configuration with its LUTs held inline, returning a processor
+# between two of its colourspaces without reading or writing any files.
+def create_processor(
+    params=None, source="Linear BT.709", destination="AgX Base"
+):
+    args = resolve_parameters(params or {})
+
+    matrix_working, matrix_destination = calculate_matrices(args)
+    config = assemble_config(
+        args,
+        matrix_working,
+        matrix_destination,
+        luts=calculate_LUTs(args),
     )
 
+    return config.getProcessor(source, destination)
+
+
+# The transform of a LUT, either a reference to its file or, when the LUT
+# tables are given, a Lut1DTransform holding the table itself.
+def create_LUT_transform(LUT_filename, luts=None):
+    import PyOpenColorIO
+
+    if luts is None:
+        return PyOpenColorIO.FileTransform(src=LUT_filename)
+
+    import numpy
+
+    table = numpy.asarray(luts[LUT_filename], dtype=numpy.float32)
+    transform = PyOpenColorIO.Lut1DTransform(length=len(table))
+    transform.setData(numpy.ascontiguousarray(numpy.repeat(table, 3)))
+
+    return transform
+
+
+# The working and destination matrices, which depend only on the
+# gamut_parameters.
+def calculate_matrices(args):
+    import colour
+    import AgX
+
     # AgX
     colourspace_source = colour.RGB_COLOURSPACES["ITU-R BT.709"]
-    args.tinting_rotate += 180.0
+    tinting_rotate = args.tinting_rotate + 180.0
 
     colourspace_working = AgX.AgX_create_colourspace(
         primaries_rotate=args.primaries_rotate,
@@ -242,13 +452,13 @@ if __name__ == "__main__":
     colourspace_destination = AgX.AgX_create_colourspace(
         primaries_rotate=args.primaries_rotate,
         primaries_scale=args.primaries_outset,
-        tinting_rotate=args.tinting_rotate,
+        tinting_rotate=tinting_rotate,
         tinting_outset=args.tinting_outset,
         name="Custom AgX Destination Space",
     )
 
     matrix_working = AgX.shape_OCIO_matrix(
-        colour.matrix_RGB_to_RGB(
+        AgX.calculate_matrix_RGB_to_RGB(
             colourspace_working,
             colourspace_source,
             chromatic_adaptation_transform=None,
@@ -256,7 +466,7 @@ if __name__ == "__main__":
     )
 
     matrix_destination = AgX.shape_OCIO_matrix(
-        colour.matrix_RGB_to_RGB(
+        AgX.calculate_matrix_RGB_to_RGB(
             colourspace_destination,
             colourspace_source,
             chromatic_adaptation_transform=None,
@@ -264,10 +474,233 @@ if __name__ == "__main__":
     )
 
     if args.verbose_plotting is True:
+        import colour.plotting
+
         colour.plotting.plot_RGB_colourspaces_in_chromaticity_diagram_CIE1931(
             [colourspace_working, colourspace_destination, colourspace_source]
         )
 
+    return matrix_working, matrix_destination
+
+
+# The LUT tables keyed on their file names, which depend only on the
+# curve_parameters.
+def calculate_LUTs(args):
+    import numpy
+    import sigmoid
+
+    luts = {}
+
+    ####
+    # Creative Looks LUTs
+    ###
+
+    #####
+    # Curve Setup
+    #####
+
+    curve = {
+        "pivots": [args.fulcrum_input, args.fulcrum_output],
+        "slope": args.fulcrum_slope,
+        "powers": [args.exponent_toe, args.exponent_shoulder],
+    }
+
+    # Each LUT is either of the default size, or of the smallest size whose
+    # interpolation is within the tolerance of the curve.
+    def calculate_x_input(inverse):
+        if args.LUT_tolerance is None:
+            return numpy.linspace(0.0, 1.0, default_LUT_size)
+
+        return numpy.linspace(
+            0.0,
+            1.0,
+            sigmoid.calculate_LUT_size(
+                args.LUT_tolerance, inverse=inverse, **curve
+            ),
+        )
+
+    y_LUT = sigmoid.calculate_sigmoid(calculate_x_input(False), **curve)
+
+    aesthetic_LUT_name = "AgX Default Contrast"
+    aesthetic_LUT_safe = aesthetic_LUT_name.replace(" ", "_")
+    if args.analytic_curve is not True:
+        luts["{}.spi1d".format(aesthetic_LUT_safe)] = y_LUT
+
+    if args.inverse_LUT is True:
+        x_LUT = sigmoid.calculate_sigmoid_inverse(
+            calculate_x_input(True), **curve
+        )
+        luts["{}_Inverse.spi1d".format(aesthetic_LUT_safe)] = x_LUT
+
+    return luts
+
+
+# Fit the contrast curve with the B-spline of a GradingRGBCurveTransform,
+# with control points spaced evenly over the domain and carrying the slope of
+# the sigmoid. Control points are added until the maximum error against the
+# sigmoid, measured through OpenColorIO itself, is within the tolerance, or
+# until OpenColorIO accepts no more. OpenColorIO limits the control points of
+# a curve, so very small tolerances cannot be reached, in which case the most
+# accurate fit is returned with a warning. Returns the control points, slopes
+# and maximum error of the fit.
+def calculate_curve_spline(args):
+    import PyOpenColorIO
+    import numpy
+    import sigmoid
+
+    curve = {
+        "pivots": [args.fulcrum_input, args.fulcrum_output],
+        "slope": args.fulcrum_slope,
+        "powers": [args.exponent_toe, args.exponent_shoulder],
+    }
+
+    x_error = numpy.linspace(0.0, 1.0, analytic_error_samples)
+    y_error = sigmoid.calculate_sigmoid(x_error, **curve)
+    samples = numpy.repeat(x_error[:, numpy.newaxis], 3, axis=1).astype(
+        numpy.float32
+    )
+    delta = 1.0 / analytic_error_samples
+
+    best = None
+    control_points_count = 3
+    while best is None or best["error"] > args.analytic_tolerance:
+        x_points = numpy.linspace(0.0, 1.0, control_points_count)
+        x_below = numpy.maximum(x_points - delta, 0.0)
+        x_above = numpy.minimum(x_points + delta, 1.0)
+        spline = {
+            "control_points": numpy.stack(
+                [x_points, sigmoid.calculate_sigmoid(x_points, **curve)],
+                axis=-1,
+            )
+            .ravel()
+            .tolist(),
+            "slopes": (
+                (
+                    sigmoid.calculate_sigmoid(x_above, **curve)
+                    - sigmoid.calculate_sigmoid(x_below, **curve)
+                )
+                / (x_above - x_below)
+            ).tolist(),
+        }
+
+        try:
+            processor = (
+                PyOpenColorIO.Config.CreateRaw()
+                .getProcessor(create_curve_transform(spline))
+                .getDefaultCPUProcessor()
+            )
+        except PyOpenColorIO.Exception:
+            if best is None:
+                raise
+            break
+
+        evaluated = samples.copy()
+        processor.applyRGB(evaluated)
+        spline["error"] = float(
+            numpy.max(numpy.abs(evaluated[:, 0] - y_error))
+        )
+        if best is None or spline["error"] < best["error"]:
+            best = spline
+        control_points_count += 1
+
+    if best["error"] > args.analytic_tolerance:
+        import warnings
+
+        warnings.warn(
+            "The analytic contrast curve reached a maximum error of {:.3g} "
+            "with {} control points, short of the tolerance of {:.3g}.".format(
+                best["error"], len(best["slopes"]), args.analytic_tolerance
+            )
+        )
+
+    return best
+
+
+# The contrast curve as a spline, clamped to the domain as the LUT would be.
+def create_curve_transform(spline):
+    import PyOpenColorIO
+
+    identity = PyOpenColorIO.GradingBSplineCurve([0.0, 0.0, 1.0, 1.0])
+    master = PyOpenColorIO.GradingBSplineCurve(spline["control_points"])
+    master.setSlopes(spline["slopes"])
+
+    return PyOpenColorIO.GroupTransform(
+        [
+            PyOpenColorIO.RangeTransform(
+                minInValue=0.0,
+                maxInValue=1.0,
+                minOutValue=0.0,
+                maxOutValue=1.0,
+            ),
+            PyOpenColorIO.GradingRGBCurveTransform(
+                PyOpenColorIO.GradingRGBCurve(
+                    identity, identity, identity, master
+                ),
+                style=PyOpenColorIO.GRADING_LOG,
+            ),
+        ]
+    )
+
+
+# Assemble the configuration around previously calculated matrices, with the
+# LUTs resolved through the given search paths. When the LUT tables are given,
+# as returned by calculate_LUTs, they are instead held inline and nothing is
+# read from disk. Such a configuration may build processors, but cannot be
+# serialized.
+def assemble_config(
+    args,
+    matrix_working,
+    matrix_destination,
+    search_paths=LUT_search_paths,
+    verbose=False,
+    luts=None,
+):
+    import PyOpenColorIO
+    import colour
+    import AgX
+
+    if args.analytic_curve is True:
+        spline = calculate_curve_spline(args)
+        curve_transform = create_curve_transform(spline)
+        if verbose is True:
+            print(
+                "Analytic contrast curve of {} control points, maximum error "
+                "{:.3g}".format(len(spline["slopes"]), spline["error"])
+            )
+    else:
+        curve_transform = create_LUT_transform(
+            "AgX_Default_Contrast.spi1d", luts
+        )
+
+    config = PyOpenColorIO.Config()
+    description = (
+        "A dangerous picture formation chain designed for Eduardo Suazo and "
+        "Chris Brejon."
+    )
+    config.setDescription(description)
+    config.setMinorVersion(0)
+
+    config.setSearchPath(":".join(search_paths))
+
+    # Establish a displays dictionary to track the displays. Append
+    # the respective display at each of the display colourspace definitions
+    # for clarity.
+    displays = {}
+
+    ####
+    # Colourspaces
+    ####
+
+    # Define a generic tristimulus linear working space, with assumed
+    # BT.709 primaries and a D65 achromatic point.
+    config, colourspace = AgX.add_colourspace(
+        config=config,
+        family="Colourspaces",
+        name="Linear BT.709",
+        description="Open Domain Linear BT.709 Tristimulus",
+        aliases=["Linear", "Linear Tristimulus"],
+    )
+
     transform_list = [
         PyOpenColorIO.RangeTransform(minInValue=0.0, minOutValue=0.0),
         PyOpenColorIO.MatrixTransform(matrix_working),
@@ -353,7 +786,7 @@ if __name__ == "__main__":
     # Add Display P3.
     Display_P3_Colourspace = colour.RGB_COLOURSPACES["Display P3"]
     sRGB_Colourspace = colour.RGB_COLOURSPACES["sRGB"]
-    D_P3_RGB_to_sRGB_matrix = colour.matrix_RGB_to_RGB(
+    D_P3_RGB_to_sRGB_matrix = AgX.calculate_matrix_RGB_to_RGB(
         sRGB_Colourspace, Display_P3_Colourspace
     )
 
@@ -406,7 +839,7 @@ if __name__ == "__main__":
         PyOpenColorIO.ColorSpaceTransform(
             src="Linear BT.709", dst="AgX Log (SB2383)"
         ),
-        PyOpenColorIO.FileTransform(src="AgX_Default_Contrast.spi1d"),
+        curve_transform,
         PyOpenColorIO.ExponentTransform(
             value=[2.2, 2.2, 2.2, 1.0],
             direction=PyOpenColorIO.TransformDirection.TRANSFORM_DIR_FORWARD,
@@ -430,6 +863,35 @@ if __name__ == "__main__":
         referencespace=PyOpenColorIO.ReferenceSpaceType.REFERENCE_SPACE_SCENE,
     )
 
+    # Give AgX Base the closed form inverse of the contrast curve as its to
+    # reference direction, rather than having OpenColorIO invert the forward
+    # LUT, so that AgX Base encoded values return to open domain tristimulus.
+    if args.inverse_LUT is True:
+        transform_list = [
+            PyOpenColorIO.ExponentTransform(
+                value=[2.2, 2.2, 2.2, 1.0],
+                direction=PyOpenColorIO.TRANSFORM_DIR_FORWARD,
+            ),
+            PyOpenColorIO.MatrixTransform(
+                matrix_destination,
+                direction=PyOpenColorIO.TRANSFORM_DIR_FORWARD,
+            ),
+            PyOpenColorIO.ExponentTransform(
+                value=[2.2, 2.2, 2.2, 1.0],
+                direction=PyOpenColorIO.TRANSFORM_DIR_INVERSE,
+            ),
+            create_LUT_transform("AgX_Default_Contrast_Inverse.spi1d", luts),
+            PyOpenColorIO.ColorSpaceTransform(
+                src="AgX Log (SB2383)", dst="Linear BT.709"
+            ),
+        ]
+
+        colourspace.setTransform(
+            PyOpenColorIO.GroupTransform(transform_list),
+            PyOpenColorIO.COLORSPACE_DIR_TO_REFERENCE,
+        )
+        config.addColorSpace(colourspace)
+
     # TODO: Move this to a different section.
     AgX.add_view(displays, "sRGB", "AgX", "AgX Base")
 
@@ -490,41 +952,6 @@ if __name__ == "__main__":
         isdata=True,
     )
 
-    ####
-    # Creative Looks LUTs
-    ###
-
-    #####
-    # Curve Setup
-    #####
-
-    x_input = numpy.linspace(0.0, 1.0, 4096)
-
-    y_LUT = sigmoid.calculate_sigmoid(
-        x_input,
-        pivots=[args.fulcrum_input, args.fulcrum_output],
-        slope=args.fulcrum_slope,
-        powers=[args.exponent_toe, args.exponent_shoulder],
-    )
-
-    aesthetic_LUT_name = "AgX Default Contrast"
-    aesthetic_LUT_safe = aesthetic_LUT_name.replace(" ", "_")
-    aesthetic_LUT = colour.LUT1D(table=y_LUT, name="AgX Default Contrast")
-
-    try:
-        output_directory = pathlib.Path(output_config_directory)
-        LUTs_directory = output_directory / output_LUTs_directory
-        LUT_filename = pathlib.Path(
-            LUTs_directory / "{}.spi1d".format(aesthetic_LUT_safe)
-        )
-        LUTs_directory.mkdir(parents=True, exist_ok=True)
-        colour.io.luts.write_LUT(
-            aesthetic_LUT, LUT_filename, method="Sony SPI1D"
-        )
-
-    except Exception as ex:
-        raise ex
-
     ####
     # Config Generation
     ####
@@ -549,31 +976,126 @@ if __name__ == "__main__":
         config.setRole(role, transform)
 
     all_displays = {}
-    all_views = {}
 
     for display, views in displays.items():
         # all_displays.add(display)
         for view, transform in views.items():
             all_displays.update({display: {view: transform}})
-            print(
-                "Adding Display: {}, View: {}, Transform: {}".format(
-                    display, view, transform
+            if verbose is True:
+                print(
+                    "Adding Display: {}, View: {}, Transform: {}".format(
+                        display, view, transform
+                    )
                 )
-            )
             config.addDisplayView(
                 display=display, view=view, colorSpaceName=transform
             )
 
+    config.validate()
+
+    return config
+
+
+# Write the LUT tables into the LUTs directory under the output directory,
+# returning the written files relative to the output directory.
+def write_LUTs(luts, output_directory, LUTs_directory=output_LUTs_directory):
+    import build_cache
+    import LUT_io
+
+    files = []
+    output_directory = pathlib.Path(output_directory)
+
+    for LUT_filename, table in luts.items():
+        LUT_path = pathlib.Path(LUTs_directory) / LUT_filename
+
+        build_cache.write_file_atomic(
+            output_directory / LUT_path,
+            lambda temporary: LUT_io.write_SPI1D(temporary, table),
+        )
+        files.append(LUT_path.as_posix())
+
+    return files
+
+
+# Write the configuration and its LUTs, as returned by build_config. Each file
+# is written atomically, and files whose bytes are unchanged are left alone so
+# as not to disturb anything watching them. Returns the written paths relative
+# to the output directory.
+def write_config(
+    config, luts, output_directory=output_config_directory, verbose=True
+):
+    import build_cache
+
+    files = []
     try:
-        config.validate()
+        output_directory = pathlib.Path(output_directory)
 
-        output_directory = pathlib.Path(output_config_directory)
-        output_directory.mkdir(parents=True, exist_ok=True)
-        output_file = output_directory / output_config_name
+        files += write_LUTs(luts, output_directory)
 
-        write_file = open(output_file, "w")
-        write_file.write(config.serialize())
-        write_file.close()
-        print('Wrote config "{}"'.format(output_config_name))
+        config_text = config.serialize()
+
+        def write_config_text(temporary):
+            with open(temporary, "w") as write_file:
+                write_file.write(config_text)
+
+        build_cache.write_file_atomic(
+            output_directory / output_config_name, write_config_text
+        )
+        files.append(output_config_name)
+        if verbose is True:
+            print('Wrote config "{}"'.format(output_config_name))
     except Exception as ex:
         raise ex
+
+    return files
+
+
+if __name__ == "__main__":
+    args = create_argparser().parse_args()
+
+    # The persisted colourspaces and matrices are salted with the generator
+    # sources and library versions, so that entries from an edited generator
+    # or an upgraded library are not reused.
+    if args.cache_directory is not None:
+        import build_cache
+        import memoize
+
+        memoize.set_cache_directory(
+            args.cache_directory, salt=build_cache.calculate_source_digest()
+        )
+
+    build_key = None
+    if args.build_cache is not None:
+        import build_cache
+
+        build_parameters = dict(vars(args))
+        for parameter in nonbuild_parameters:
+            del build_parameters[parameter]
+        build_key = build_cache.calculate_build_key(build_parameters)
+
+        if (
+            build_cache.restore(
+                args.build_cache, build_key, output_config_directory
+            )
+            is not None
+        ):
+            print('Restored config "{}" from build cache'.format(build_key))
+            raise SystemExit(0)
+
+    if args.stage_directory is not None:
+        import stage_graph
+
+        graph = stage_graph.create_generator_graph(args.stage_directory)
+        artifacts, executed = graph.run(
+            resolve_parameters(args), output=output_config_directory
+        )
+        files = artifacts["write_LUTs"] + artifacts["write_config"]
+        print("Re-ran stages: {}".format(", ".join(executed) or "none"))
+    else:
+        config, luts = build_config(args, verbose=True)
+        files = write_config(config, luts)
+
+    if build_key is not None:
+        build_cache.store(
+            args.build_cache, build_key, output_config_directory, files
+        )
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""image_engine
+
+NumPy reference implementation of the AgX Base view, applying the same chain
+the configuration encodes to float32 images without loading a configuration.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import time
+import numpy
+
+# The smallest value OpenColorIO takes the logarithm of.
+log2_minimum = numpy.finfo(numpy.float32).tiny
+
+display_exponent = 2.2
+
+
+# Reshape a flattened 4x4 OpenColorIO matrix, as returned by
+# AgX.shape_OCIO_matrix, back into its 3x3 form.
+def unshape_OCIO_matrix(ocio_matrix):
+    return numpy.reshape(ocio_matrix, (4, 4))[:3, :3]
+
+
+# The AgX Base chain of the configuration, in order:
+#   1. Clamp negative values and NaN, as the RangeTransform does.
+#   2. The working matrix.
+#   3. The LG2 allocation between the low and high limits.
+#   4. The contrast curve, interpolated from its LUT as OpenColorIO does.
+#   5. The 2.2 exponent.
+#   6. The inverse destination matrix.
+#   7. The inverse 2.2 exponent, clamping negative values.
+# Images are float32 arrays of shape (..., 3), processed through buffers
+# that are held and reused across calls.
+class AgXBaseEngine:
+    def __init__(
+        self, matrix_working, matrix_destination, limit_low, limit_high, table
+    ):
+        self.matrix_working = numpy.ascontiguousarray(
+            numpy.transpose(unshape_OCIO_matrix(matrix_working)),
+            dtype=numpy.float32,
+        )
+        self.matrix_destination_inverse = numpy.ascontiguousarray(
+            numpy.transpose(
+                numpy.linalg.inv(unshape_OCIO_matrix(matrix_destination))
+            ),
+            dtype=numpy.float32,
+        )
+
+        # Fold the allocation fit into a single scale and offset.
+        log_low = float(numpy.log2(numpy.exp2(limit_low) * 0.18))
+        log_high = float(numpy.log2(numpy.exp2(limit_high) * 0.18))
+        self.log_scale = numpy.float32(1.0 / (log_high - log_low))
+        self.log_offset = numpy.float32(-log_low / (log_high - log_low))
+
+        # Interpolate from the table and the difference to the next entry,
+        # with the final entry repeated so the top of the domain needs no
+        # special case.
+        table = numpy.asarray(table, dtype=numpy.float32)
+        self.table = table
+        self.table_delta = numpy.append(numpy.diff(table), numpy.float32(0))
+        self.table_scale = numpy.float32(len(table) - 1)
+
+        self.buffer_size = 0
+
+    # Buffers are only reallocated when an image outgrows them, so that
+    # smaller images, such as the final chunk of a stream, reuse them.
+    def allocate(self, shape):
+        size = int(numpy.prod(shape))
+        if self.buffer_size < size:
+            self.buffer = numpy.empty(size, dtype=numpy.float32)
+            self.indices = numpy.empty(size, dtype=numpy.intp)
+            self.delta = numpy.empty(size, dtype=numpy.float32)
+            self.buffer_size = size
+
+        return (
+            self.buffer[:size].reshape(shape),
+            self.indices[:size].reshape(shape),
+            self.delta[:size].reshape(shape),
+        )
+
+    def __call__(self, image, out=None):
+        image = numpy.asarray(image, dtype=numpy.float32)
+        if image.shape[-1] != 3:
+            raise ValueError(
+                "Expected an image of shape (..., 3), not {}.".format(
+                    image.shape
+                )
+            )
+        if out is None:
+            out = numpy.empty_like(image)
+
+        buffer, indices, delta = self.allocate(image.shape)
+
+        numpy.fmax(image, 0.0, out=buffer)
+        with numpy.errstate(invalid="ignore"):
+            numpy.matmul(buffer, self.matrix_working, out=out)
+
+        numpy.maximum(out, log2_minimum, out=out)
+        numpy.log2(out, out=out)
+        out *= self.log_scale
+        out += self.log_offset
+
+        # Linear interpolation of the clamped LUT, as position = index +
+        # fraction within the table.
+        numpy.clip(out, 0.0, 1.0, out=out)
+        # Infinite channels mixed by the working matrix leave NaN behind,
+        # which would otherwise become an invalid index.
+        numpy.nan_to_num(out, copy=False, nan=0.0)
+        out *= self.table_scale
+        numpy.floor(out, out=buffer)
+        numpy.copyto(indices, buffer, casting="unsafe")
+        out -= buffer
+        numpy.take(self.table_delta, indices, out=delta)
+        out *= delta
+        numpy.take(self.table, indices, out=buffer)
+        out += buffer
+
+        numpy.power(out, display_exponent, out=out)
+        numpy.matmul(out, self.matrix_destination_inverse, out=buffer)
+
+        numpy.maximum(buffer, 0.0, out=buffer)
+        numpy.power(buffer, 1.0 / display_exponent, out=out)
+
+        return out
+
+
+# Create the engine for a set of generate_config parameters. The contrast
+# curve table is sampled from the sigmoid directly, as the configuration may
+# carry the curve analytically rather than as a LUT.
+def create_engine(params=None):
+    import generate_config
+    import sigmoid
+
+    args = generate_config.resolve_parameters(params or {})
+    matrix_working, matrix_destination = generate_config.calculate_matrices(
+        args
+    )
+
+    curve = {
+        "pivots": [args.fulcrum_input, args.fulcrum_output],
+        "slope": args.fulcrum_slope,
+        "powers": [args.exponent_toe, args.exponent_shoulder],
+    }
+    size = generate_config.default_LUT_size
+    if args.LUT_tolerance is not None:
+        size = sigmoid.calculate_LUT_size(args.LUT_tolerance, **curve)
+
+    return AgXBaseEngine(
+        matrix_working,
+        matrix_destination,
+        args.limit_low,
+        args.limit_high,
+        sigmoid.calculate_sigmoid(numpy.linspace(0.0, 1.0, size), **curve),
+    )
+
+
+# The maximum absolute difference between the engine and an OpenColorIO
+# processor over the image.
+def compare_to_processor(engine, processor, image):
+    expected = numpy.array(image, dtype=numpy.float32)
+    processor.applyRGB(expected)
+
+    return float(numpy.max(numpy.abs(engine(image) - expected)))
+
+
+# An open domain test image, spanning the allocation range with some
+# negative, NaN and infinite values thrown in.
+def create_test_image(height, width, seed=0):
+    generator = numpy.random.default_rng(seed)
+    image = 0.18 * numpy.exp2(
+        generator.uniform(-14.0, 10.0, (height, width, 3))
+    )
+    image[generator.uniform(size=image.shape) < 0.01] *= -1.0
+    for value in [numpy.nan, numpy.inf, -numpy.inf]:
+        image[generator.uniform(size=image.shape) < 0.001] = value
+
+    return image.astype(numpy.float32)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import PyOpenColorIO
+    import generate_config
+
+    argparser = argparse.ArgumentParser(
+        description="Compares the NumPy AgX Base engine against OpenColorIO",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "-s",
+        "--size",
+        help="Height and width of the test image",
+        type=int,
+        nargs=2,
+        default=[1080, 1920],
+    )
+    argparser.add_argument(
+        "-r", "--repeats", help="Number of timed runs", type=int, default=5
+    )
+    args = argparser.parse_args()
+
+    engine = create_engine()
+    image = create_test_image(*args.size)
+    out = numpy.empty_like(image)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config, luts = generate_config.build_config({})
+        generate_config.write_config(
+            config, luts, output_directory=directory, verbose=False
+        )
+        config.setWorkingDir(directory)
+        processor = config.getProcessor("Linear BT.709", "AgX Base")
+
+        # The default processor approximates the exponents, so the engine is
+        # held to the lossless processor.
+        lossless_processor = processor.getOptimizedCPUProcessor(
+            PyOpenColorIO.OPTIMIZATION_LOSSLESS
+        )
+        processor = processor.getDefaultCPUProcessor()
+
+        for name, compared in [
+            ("lossless", lossless_processor),
+            ("default", processor),
+        ]:
+            print(
+                "Maximum difference to the {} OpenColorIO processor: "
+                "{:.3g}".format(
+                    name, compare_to_processor(engine, compared, image)
+                )
+            )
+
+    for name, apply in [
+        ("NumPy engine", lambda: engine(image, out=out)),
+        ("OpenColorIO", lambda: processor.applyRGB(image.copy())),
+    ]:
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            apply()
+        print(
+            "{:<14} {:8.1f} ms per image".format(
+                name, (time.perf_counter() - start) / args.repeats * 1000.0
+            )
+        )
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""memoize
+
+Keyed caching of derived colourspaces and matrices, with an optional on-disk
+tier shared between processes.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import collections
+import copy
+import functools
+import hashlib
+import inspect
+import numbers
+import os
+import pathlib
+import pickle
+import tempfile
+import threading
+import numpy
+
+
+# Reduce a value to a hashable canonical form. Floats are keyed on their exact
+# hexadecimal representation so that lists, tuples and arrays describing the
+# same parameters share an entry. Colourspaces are keyed on the values that
+# define them, including their matrices and transfer functions, rather than
+# object identity. Functions are keyed on their qualified names.
+def canonical_key(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bool, numpy.bool_)):
+        return bool(value)
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        # Adding zero folds negative zero into zero.
+        return float(value + 0.0).hex()
+    if isinstance(value, dict):
+        return tuple((key, canonical_key(value[key])) for key in sorted(value))
+    if hasattr(value, "primaries") and hasattr(value, "whitepoint"):
+        return (
+            "RGB_Colourspace",
+            value.name,
+            canonical_key(value.primaries),
+            canonical_key(value.whitepoint),
+            value.whitepoint_name,
+            canonical_key(value.matrix_RGB_to_XYZ),
+            canonical_key(value.matrix_XYZ_to_RGB),
+            canonical_key(value.cctf_encoding),
+            canonical_key(value.cctf_decoding),
+        )
+    if isinstance(value, (list, tuple, numpy.ndarray)):
+        return tuple(canonical_key(item) for item in value)
+    if isinstance(value, functools.partial):
+        return (
+            "partial",
+            canonical_key(value.func),
+            canonical_key(value.args),
+            canonical_key(value.keywords),
+        )
+    if callable(value) and hasattr(value, "__qualname__"):
+        return ("function", value.__module__, value.__qualname__)
+
+    raise TypeError(
+        "Cannot derive a cache key from {}.".format(type(value).__name__)
+    )
+
+
+# Arrays handed out from the cache are shared between callers, so they are
+# marked read only to guard against accidental modification.
+def freeze(value):
+    if isinstance(value, numpy.ndarray):
+        value.flags.writeable = False
+
+    return value
+
+
+# Other values, such as colourspaces, cannot be made read only, so each caller
+# is handed its own copy of them.
+def share(value):
+    if isinstance(value, numpy.ndarray):
+        return value
+
+    return copy.deepcopy(value)
+
+
+# The on-disk tier outlives the process, so its entries are additionally
+# keyed on the salt, which should identify whatever else the cached values
+# depend on, such as the sources and library versions.
+class ParameterCache:
+    def __init__(self, maxsize=128, directory=None, salt=""):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.salt = salt
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        digest = hashlib.sha256(
+            repr((self.salt, key)).encode("utf-8")
+        ).hexdigest()
+
+        return pathlib.Path(self.directory) / "{}.pickle".format(digest)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+
+        if self.directory is not None:
+            try:
+                with open(self.path(key), "rb") as read_file:
+                    value = freeze(pickle.load(read_file))
+            # Any entry that cannot be loaded, such as one pickled against
+            # other library versions, is a miss.
+            except Exception:
+                pass
+            else:
+                self.store(key, value)
+                with self.lock:
+                    self.hits += 1
+                return True, value
+
+        with self.lock:
+            self.misses += 1
+
+        return False, None
+
+    def store(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def put(self, key, value):
+        value = freeze(value)
+        self.store(key, value)
+
+        if self.directory is not None:
+            directory = pathlib.Path(self.directory)
+            directory.mkdir(parents=True, exist_ok=True)
+
+            # Write to a temporary file and move it into place, so that
+            # concurrent processes never read a partial entry.
+            handle, temporary = tempfile.mkstemp(dir=directory)
+            try:
+                with os.fdopen(handle, "wb") as write_file:
+                    pickle.dump(value, write_file)
+                os.replace(temporary, self.path(key))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+default_cache = ParameterCache()
+
+
+def set_cache_directory(directory, salt=""):
+    default_cache.directory = directory
+    default_cache.salt = salt
+
+
+# Memoize a function in a ParameterCache, keyed on the canonical form of its
+# bound arguments. The key is salted with the compiled function body, so that
+# on-disk entries from an edited function are not reused.
+def memoize(cache=default_cache):
+    def decorator(function):
+        signature = inspect.signature(function)
+        salt = hashlib.sha256(
+            function.__code__.co_code
+            + repr(function.__code__.co_consts).encode("utf-8")
+        ).hexdigest()
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            key = (
+                function.__module__,
+                function.__qualname__,
+                salt,
+                canonical_key(arguments.arguments),
+            )
+
+            found, value = cache.get(key)
+            if not found:
+                value = cache.put(key, function(*args, **kwargs))
+
+            return share(value)
+
+        return wrapper
+
+    return decorator
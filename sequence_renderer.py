@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""sequence_renderer
+
+Render image sequences through the views of a generated configuration.
+Frames are distributed in batches across a pool of worker processes, each of
+which builds its OpenColorIO processors once, and overlaps decoding the next
+frames and encoding the previous ones with the transform of the current one.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import itertools
+import os
+import pathlib
+import time
+import numpy
+
+default_views = ["AgX Base", "AgX Base BT.1886", "AgX Base Display P3"]
+
+# Frames decoded ahead of the one being transformed, per worker.
+prefetch_frames = 2
+
+# The processors of the worker process, keyed on view.
+worker_processors = None
+
+
+def read_frame(path):
+    if pathlib.Path(path).suffix == ".npy":
+        frame = numpy.load(path)
+        return numpy.ascontiguousarray(frame[..., :3], dtype=numpy.float32)
+
+    import stream_processor
+
+    OpenImageIO = stream_processor.import_OpenImageIO()
+    image_input = OpenImageIO.ImageInput.open(str(path))
+    if image_input is None:
+        raise OSError(OpenImageIO.geterror())
+    try:
+        frame = image_input.read_image(0, 0, 0, 3, "float")
+    finally:
+        image_input.close()
+
+    return numpy.ascontiguousarray(frame, dtype=numpy.float32)
+
+
+def write_frame(path, frame, data_format="half"):
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".npy":
+        numpy.save(path, frame)
+        return
+
+    import stream_processor
+
+    OpenImageIO = stream_processor.import_OpenImageIO()
+    image_output = OpenImageIO.ImageOutput.create(str(path))
+    if image_output is None:
+        raise OSError(OpenImageIO.geterror())
+    height, width = frame.shape[:2]
+    if not image_output.open(
+        str(path), OpenImageIO.ImageSpec(width, height, 3, data_format)
+    ):
+        raise OSError(image_output.geterror())
+    try:
+        image_output.write_image(frame)
+    finally:
+        image_output.close()
+
+
+def initialize_renderer(config_path, source, views):
+    import PyOpenColorIO
+
+    config = PyOpenColorIO.Config.CreateFromFile(str(config_path))
+
+    global worker_processors
+    worker_processors = {
+        view: config.getProcessor(source, view).getDefaultCPUProcessor()
+        for view in views
+    }
+
+
+def view_directory_name(view):
+    return view.replace(" ", "_")
+
+
+# The directory every frame lies within, against which the output paths keep
+# the relative directories of the frames.
+def calculate_base_directory(frame_paths):
+    return os.path.commonpath(
+        [os.path.dirname(os.path.abspath(path)) for path in frame_paths]
+    )
+
+
+def calculate_output_path(
+    frame_path, output_directory, view, extension, base_directory
+):
+    frame_path = pathlib.Path(os.path.abspath(frame_path))
+
+    return (
+        pathlib.Path(output_directory)
+        / view_directory_name(view)
+        / frame_path.parent.relative_to(base_directory)
+        / (frame_path.stem + (extension or frame_path.suffix))
+    )
+
+
+# Frames sharing a stem, such as the same frame in two formats, would still
+# be written to the same output, so refuse them before rendering anything.
+def check_output_paths(frame_paths, extension, base_directory):
+    outputs = {}
+    for frame_path in frame_paths:
+        output_path = calculate_output_path(
+            frame_path, "", "", extension, base_directory
+        )
+        if output_path in outputs:
+            raise ValueError(
+                "Frames {} and {} would both render to {}.".format(
+                    outputs[output_path], frame_path, output_path
+                )
+            )
+        outputs[output_path] = frame_path
+
+
+# Render a batch of frames through every view. Decoding runs ahead on a
+# thread while the current frame is transformed, and encoding trails behind
+# on another, so that file input and output overlaps the transforms. Both
+# are bounded, so that frames do not pile up in memory should either fall
+# behind.
+def render_batch(
+    frame_paths, output_directory, base_directory, extension=None
+):
+    views = list(worker_processors)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=1
+    ) as decoder, concurrent.futures.ThreadPoolExecutor(
+        max_workers=1
+    ) as encoder:
+        remaining = iter(frame_paths)
+        decodes = collections.deque(
+            (frame_path, decoder.submit(read_frame, frame_path))
+            for frame_path in itertools.islice(remaining, prefetch_frames)
+        )
+        encodes = collections.deque()
+
+        while decodes:
+            frame_path, decoded = decodes.popleft()
+            for frame_path_next in itertools.islice(remaining, 1):
+                decodes.append(
+                    (
+                        frame_path_next,
+                        decoder.submit(read_frame, frame_path_next),
+                    )
+                )
+
+            frame = decoded.result()
+            for index, view in enumerate(views):
+                # The final view transforms the decoded frame in place.
+                rendered = frame if index == len(views) - 1 else frame.copy()
+                worker_processors[view].applyRGB(rendered)
+                encodes.append(
+                    encoder.submit(
+                        write_frame,
+                        calculate_output_path(
+                            frame_path,
+                            output_directory,
+                            view,
+                            extension,
+                            base_directory,
+                        ),
+                        rendered,
+                    )
+                )
+
+            while len(encodes) > prefetch_frames * len(views):
+                encodes.popleft().result()
+
+        for encode in encodes:
+            encode.result()
+
+    return len(frame_paths)
+
+
+def create_batches(frame_paths, batch_size):
+    return [
+        frame_paths[index:stop]
+        for index, stop in zip(
+            range(0, len(frame_paths), batch_size),
+            range(batch_size, len(frame_paths) + batch_size, batch_size),
+        )
+    ]
+
+
+def render_sequence(
+    frame_paths,
+    config_path,
+    output_directory,
+    views=default_views,
+    source="Linear BT.709",
+    jobs=None,
+    batch_size=8,
+    extension=None,
+    verbose=False,
+):
+    jobs = jobs or os.cpu_count()
+    frame_paths = [str(frame_path) for frame_path in frame_paths]
+    if not frame_paths:
+        return 0, 0.0
+    base_directory = calculate_base_directory(frame_paths)
+    check_output_paths(frame_paths, extension, base_directory)
+
+    start = time.perf_counter()
+    rendered = 0
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=initialize_renderer,
+        initargs=(config_path, source, list(views)),
+    ) as executor:
+        futures = [
+            executor.submit(
+                render_batch,
+                batch,
+                output_directory,
+                base_directory,
+                extension,
+            )
+            for batch in create_batches(frame_paths, batch_size)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            rendered += future.result()
+            if verbose is True:
+                print(
+                    "Rendered {} of {} frames".format(
+                        rendered, len(frame_paths)
+                    )
+                )
+
+    seconds = time.perf_counter() - start
+    if verbose is True:
+        print(
+            "Rendered {} frames through {} views in {:.2f} s, {:.1f} "
+            "frames per second, {:.1f} view frames per second".format(
+                rendered,
+                len(views),
+                seconds,
+                rendered / seconds,
+                rendered * len(views) / seconds,
+            )
+        )
+
+    return rendered, seconds
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Renders image sequences through the views of a "
+        "configuration across a pool of worker processes",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "frames",
+        nargs="+",
+        help="Frames or glob patterns of frames, .npy or any format "
+        "OpenImageIO reads",
+    )
+    argparser.add_argument(
+        "-c",
+        "--config",
+        help="Configuration to render through",
+        default="./config/config.ocio",
+    )
+    argparser.add_argument(
+        "-o",
+        "--output_directory",
+        help="Directory to write a subdirectory of frames per view to, "
+        "keeping the directories of the frames relative to the directory "
+        "common to all of them",
+        default="./render/",
+    )
+    argparser.add_argument(
+        "-v",
+        "--views",
+        help="Colourspaces to render, each to its own subdirectory",
+        nargs="+",
+        default=default_views,
+    )
+    argparser.add_argument(
+        "-s",
+        "--source",
+        help="Colourspace of the input frames",
+        default="Linear BT.709",
+    )
+    argparser.add_argument(
+        "-e",
+        "--extension",
+        help="Output file extension, defaulting to that of each input frame",
+    )
+    argparser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of worker processes",
+        type=int,
+        default=os.cpu_count(),
+    )
+    argparser.add_argument(
+        "-b",
+        "--batch_size",
+        help="Frames handed to a worker at a time",
+        type=int,
+        default=8,
+    )
+    args = argparser.parse_args()
+
+    frame_paths = sorted(
+        set(
+            frame_path
+            for pattern in args.frames
+            for frame_path in (glob.glob(pattern) or [pattern])
+        )
+    )
+
+    render_sequence(
+        frame_paths,
+        args.config,
+        args.output_directory,
+        views=args.views,
+        source=args.source,
+        jobs=args.jobs,
+        batch_size=args.batch_size,
+        extension=args.extension,
+        verbose=True,
+    )
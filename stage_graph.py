@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""stage_graph
+
+The generator expressed as a graph of stages, each declaring the parameters
+and upstream stages it depends on. A stage is only re-run when the key
+derived from its declared inputs changes, with the artifact of every stage
+persisted between runs.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import hashlib
+import json
+import pathlib
+import pickle
+import build_cache
+
+
+# A stage calls its function with a namespace holding only its declared
+# parameters, followed by the artifacts of its upstream stages as keyword
+# arguments. Writing stages also receive the output directory ahead of the
+# artifacts, and return the files they wrote relative to it, which must all
+# still exist for the stage to be skipped. The parameters may instead be
+# declared by a function of the arguments, for stages whose dependencies vary
+# with them.
+class Stage:
+    def __init__(self, name, function, parameters=(), stages=(), writes=False):
+        self.name = name
+        self.function = function
+        self.parameters = (
+            parameters if callable(parameters) else list(parameters)
+        )
+        self.stages = list(stages)
+        self.writes = writes
+
+    def select_parameters(self, args):
+        if callable(self.parameters):
+            return list(self.parameters(args))
+
+        return self.parameters
+
+    def calculate_key(self, args, upstream_keys, source_digest, output=None):
+        digest = hashlib.sha256()
+        digest.update(source_digest.encode("utf-8"))
+        digest.update(self.name.encode("utf-8"))
+        digest.update(
+            json.dumps(
+                {
+                    parameter: build_cache.normalize_parameter(
+                        getattr(args, parameter)
+                    )
+                    for parameter in self.select_parameters(args)
+                },
+                sort_keys=True,
+            ).encode("utf-8")
+        )
+        for stage in self.stages:
+            digest.update(upstream_keys[stage].encode("utf-8"))
+        if self.writes is True:
+            digest.update(str(pathlib.Path(output).resolve()).encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def run(self, args, inputs, output=None):
+        stage_args = argparse.Namespace(
+            **{
+                parameter: getattr(args, parameter)
+                for parameter in self.select_parameters(args)
+            }
+        )
+        if self.writes is True:
+            return self.function(stage_args, output, **inputs)
+
+        return self.function(stage_args, **inputs)
+
+
+class StageGraph:
+    def __init__(self, stages, directory=None):
+        self.stages = {}
+        for stage in stages:
+            missing = [
+                name for name in stage.stages if name not in self.stages
+            ]
+            if missing:
+                raise ValueError(
+                    'Stage "{}" depends on undeclared stages {}.'.format(
+                        stage.name, ", ".join(missing)
+                    )
+                )
+            self.stages[stage.name] = stage
+
+        self.directory = directory
+        self.artifacts = {}
+        self.source_digest = build_cache.calculate_source_digest()
+
+    def path(self, name):
+        return pathlib.Path(self.directory) / "{}.pickle".format(name)
+
+    # The key and artifact of the stage from its last run, held in memory and
+    # falling back to the persisted copy.
+    def load(self, name):
+        if name not in self.artifacts and self.directory is not None:
+            try:
+                with open(self.path(name), "rb") as read_file:
+                    self.artifacts[name] = pickle.load(read_file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        return self.artifacts.get(name, (None, None))
+
+    def persist(self, name, key, artifact):
+        self.artifacts[name] = (key, artifact)
+        if self.directory is None:
+            return
+
+        def write_artifact(temporary):
+            with open(temporary, "wb") as write_file:
+                pickle.dump((key, artifact), write_file)
+
+        build_cache.write_file_atomic(self.path(name), write_artifact)
+
+    # Run the graph for the parameters, returning the artifact of every stage
+    # along with the names of the stages that were re-run. Artifacts of
+    # skipped stages are only loaded when a downstream stage needs them.
+    def run(self, args, output=None):
+        keys = {}
+        executed = []
+
+        for name, stage in self.stages.items():
+            key = stage.calculate_key(args, keys, self.source_digest, output)
+            keys[name] = key
+
+            previous_key, artifact = self.load(name)
+            if previous_key == key and (
+                stage.writes is False
+                or all(
+                    (pathlib.Path(output) / filename).exists()
+                    for filename in artifact
+                )
+            ):
+                continue
+
+            inputs = {
+                upstream: self.load(upstream)[1] for upstream in stage.stages
+            }
+            self.persist(name, key, stage.run(args, inputs, output))
+            executed.append(name)
+
+        artifacts = {name: self.load(name)[1] for name in self.stages}
+
+        return artifacts, executed
+
+
+def calculate_matrices(args):
+    import generate_config
+
+    return generate_config.calculate_matrices(args)
+
+
+def calculate_LUTs(args):
+    import generate_config
+
+    return generate_config.calculate_LUTs(args)
+
+
+# Configurations cannot be pickled, so the stage holds the serialised text.
+def assemble_config(args, matrices):
+    import generate_config
+
+    return generate_config.assemble_config(args, *matrices).serialize()
+
+
+def write_LUTs(args, output, LUTs):
+    import generate_config
+
+    return generate_config.write_LUTs(LUTs, output)
+
+
+def write_config(args, output, config):
+    import generate_config
+
+    def write_config_text(temporary):
+        with open(temporary, "w") as write_file:
+            write_file.write(config)
+
+    build_cache.write_file_atomic(
+        pathlib.Path(output) / generate_config.output_config_name,
+        write_config_text,
+    )
+
+    return [generate_config.output_config_name]
+
+
+# The generator graph. The LUTs are written ahead of the configuration
+# referencing them.
+def create_generator_graph(directory=None):
+    import generate_config
+
+    return StageGraph(
+        [
+            Stage(
+                "matrices",
+                calculate_matrices,
+                parameters=generate_config.gamut_parameters
+                + ["verbose_plotting"],
+            ),
+            Stage(
+                "LUTs",
+                calculate_LUTs,
+                parameters=generate_config.curve_parameters,
+            ),
+            Stage(
+                "config",
+                assemble_config,
+                parameters=generate_config.select_config_parameters,
+                stages=["matrices"],
+            ),
+            Stage("write_LUTs", write_LUTs, stages=["LUTs"], writes=True),
+            Stage(
+                "write_config", write_config, stages=["config"], writes=True
+            ),
+        ],
+        directory=directory,
+    )
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""stream_processor
+
+Apply the AgX Base view to frames of any size in bounded chunks of
+scanlines, so that memory use stays roughly constant regardless of the frame
+size. NumPy .npy frames are memory mapped, with processed pages released as
+the stream moves on. Other formats, such as OpenEXR, are streamed by
+scanline through OpenImageIO when it is installed.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import json
+import mmap
+import pathlib
+import resource
+import time
+import numpy
+import image_engine
+
+# Default size of a chunk of float32 RGB scanlines, in bytes.
+chunk_budget = 32 * 2**20
+
+
+def calculate_chunk_rows(width, budget=chunk_budget):
+    return max(1, budget // (width * 3 * numpy.dtype(numpy.float32).itemsize))
+
+
+# Drop the pages backing rows of a memory mapped array once they have been
+# processed, writing back any modifications first. Without this, the mapped
+# pages would accumulate in the resident set across the whole frame.
+def release_rows(array, start, stop):
+    mapping = getattr(array, "_mmap", None)
+    if mapping is None or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+
+    row_bytes = array.strides[0]
+    begin = array.offset % mmap.ALLOCATIONGRANULARITY + start * row_bytes
+    end = array.offset % mmap.ALLOCATIONGRANULARITY + stop * row_bytes
+    begin -= begin % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end <= begin:
+        return
+
+    if array.flags.writeable:
+        mapping.flush(begin, end - begin)
+    mapping.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+
+
+class NPYReader:
+    def __init__(self, path):
+        self.frame = numpy.load(path, mmap_mode="r")
+        if self.frame.ndim != 3 or self.frame.shape[2] < 3:
+            raise ValueError(
+                "Expected a frame of shape (height, width, channels), "
+                "not {}.".format(self.frame.shape)
+            )
+        self.height, self.width = self.frame.shape[:2]
+
+    def read_rows(self, start, out):
+        stop = start + len(out)
+        numpy.copyto(out, self.frame[start:stop, :, :3], casting="unsafe")
+        release_rows(self.frame, start, stop)
+
+    def close(self):
+        del self.frame
+
+
+class NPYWriter:
+    def __init__(self, path, height, width):
+        self.frame = numpy.lib.format.open_memmap(
+            path, mode="w+", dtype=numpy.float32, shape=(height, width, 3)
+        )
+
+    # The rows are transformed directly into the mapped output.
+    def acquire_rows(self, start, count):
+        stop = start + count
+        return self.frame[start:stop]
+
+    def commit_rows(self, start, count):
+        release_rows(self.frame, start, start + count)
+
+    def close(self):
+        self.frame.flush()
+        del self.frame
+
+
+def import_OpenImageIO():
+    try:
+        import OpenImageIO
+    except ImportError:
+        raise ImportError(
+            "Streaming formats other than .npy requires OpenImageIO."
+        )
+
+    return OpenImageIO
+
+
+class OIIOReader:
+    def __init__(self, path):
+        OpenImageIO = import_OpenImageIO()
+
+        self.input = OpenImageIO.ImageInput.open(str(path))
+        if self.input is None:
+            raise OSError(OpenImageIO.geterror())
+        spec = self.input.spec()
+        if spec.nchannels < 3:
+            raise ValueError(
+                "Expected at least three channels, not {}.".format(
+                    spec.nchannels
+                )
+            )
+        self.height, self.width = spec.height, spec.width
+        self.y = spec.y
+
+    def read_rows(self, start, out):
+        stop = start + len(out)
+        rows = self.input.read_scanlines(
+            0, 0, self.y + start, self.y + stop, 0, 0, 3, "float"
+        )
+        numpy.copyto(out, rows.reshape(out.shape))
+
+    def close(self):
+        self.input.close()
+
+
+class OIIOWriter:
+    def __init__(self, path, height, width, rows, data_format="half"):
+        OpenImageIO = import_OpenImageIO()
+
+        self.output = OpenImageIO.ImageOutput.create(str(path))
+        if self.output is None:
+            raise OSError(OpenImageIO.geterror())
+        spec = OpenImageIO.ImageSpec(width, height, 3, data_format)
+        if not self.output.open(str(path), spec):
+            raise OSError(self.output.geterror())
+        self.buffer = numpy.empty((rows, width, 3), dtype=numpy.float32)
+
+    def acquire_rows(self, start, count):
+        return self.buffer[:count]
+
+    def commit_rows(self, start, count):
+        if not self.output.write_scanlines(
+            start, start + count, 0, self.buffer[:count]
+        ):
+            raise OSError(self.output.geterror())
+
+    def close(self):
+        self.output.close()
+
+
+def open_reader(path):
+    if pathlib.Path(path).suffix == ".npy":
+        return NPYReader(path)
+
+    return OIIOReader(path)
+
+
+def open_writer(path, height, width, rows):
+    if pathlib.Path(path).suffix == ".npy":
+        return NPYWriter(path, height, width)
+
+    return OIIOWriter(path, height, width, rows)
+
+
+# Stream the frame through the transform, which takes a float32 chunk of
+# scanlines and the array to write the result into. The chunk buffer is
+# allocated once and reused for every chunk.
+def process_frame(input_path, output_path, transform, rows=None):
+    reader = open_reader(input_path)
+    try:
+        rows = rows or calculate_chunk_rows(reader.width)
+        rows = min(rows, reader.height)
+        writer = open_writer(output_path, reader.height, reader.width, rows)
+        try:
+            chunk = numpy.empty((rows, reader.width, 3), dtype=numpy.float32)
+            for start in range(0, reader.height, rows):
+                count = min(rows, reader.height - start)
+                reader.read_rows(start, chunk[:count])
+                transform(chunk[:count], writer.acquire_rows(start, count))
+                writer.commit_rows(start, count)
+        finally:
+            writer.close()
+    finally:
+        reader.close()
+
+    return reader.height, reader.width
+
+
+# A transform through an OpenColorIO processor. The processor works in place,
+# so the chunk is transformed and then copied into the output.
+def create_processor_transform(processor):
+    def transform(chunk, out):
+        processor.applyRGB(chunk)
+        numpy.copyto(out, chunk)
+
+    return transform
+
+
+# The maximum absolute difference between a streamed output frame and the
+# input frame applied through an OpenColorIO processor, compared chunk by
+# chunk.
+def compare_frame_to_processor(input_path, output_path, processor, rows=None):
+    reader = open_reader(input_path)
+    try:
+        output_reader = open_reader(output_path)
+        try:
+            rows = rows or calculate_chunk_rows(reader.width)
+            rows = min(rows, reader.height)
+            chunk = numpy.empty((rows, reader.width, 3), dtype=numpy.float32)
+            output = numpy.empty_like(chunk)
+            difference = 0.0
+            for start in range(0, reader.height, rows):
+                count = min(rows, reader.height - start)
+                reader.read_rows(start, chunk[:count])
+                output_reader.read_rows(start, output[:count])
+                processor.applyRGB(chunk[:count])
+                difference = max(
+                    difference,
+                    float(
+                        numpy.max(numpy.abs(output[:count] - chunk[:count]))
+                    ),
+                )
+        finally:
+            output_reader.close()
+    finally:
+        reader.close()
+
+    return difference
+
+
+def peak_resident_megabytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Applies the AgX Base view to a frame in bounded chunks "
+        "of scanlines",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "input",
+        help="Input frame, .npy or any format OpenImageIO reads, such as "
+        ".exr",
+    )
+    argparser.add_argument(
+        "output", help="Output frame, .npy or any format OpenImageIO writes"
+    )
+    argparser.add_argument(
+        "-r",
+        "--rows",
+        help="Scanlines per chunk, defaulting to {} MiB of float32 "
+        "RGB".format(chunk_budget // 2**20),
+        type=int,
+    )
+    argparser.add_argument(
+        "-p",
+        "--parameters",
+        help="JSON file of generate_config options for the NumPy engine",
+    )
+    argparser.add_argument(
+        "-c",
+        "--config",
+        help="Apply a view of this OpenColorIO configuration rather than the "
+        "NumPy engine",
+    )
+    argparser.add_argument(
+        "-d", "--display", help="Display of the view", default="sRGB"
+    )
+    argparser.add_argument("-v", "--view", help="View", default="AgX")
+    argparser.add_argument(
+        "-t",
+        "--test_size",
+        help="Write an image_engine test frame of this height and width, "
+        "with negative, NaN and infinite values, to the input first",
+        type=int,
+        nargs=2,
+    )
+    argparser.add_argument(
+        "-k",
+        "--check",
+        help="Compare the output against the view of this OpenColorIO "
+        "configuration",
+    )
+    args = argparser.parse_args()
+
+    if args.test_size is not None:
+        if pathlib.Path(args.input).suffix != ".npy":
+            raise ValueError("Test frames are written as .npy.")
+        numpy.save(args.input, image_engine.create_test_image(*args.test_size))
+
+    if args.config is not None:
+        import PyOpenColorIO
+
+        config = PyOpenColorIO.Config.CreateFromFile(args.config)
+        transform = create_processor_transform(
+            config.getProcessor(
+                PyOpenColorIO.ROLE_SCENE_LINEAR,
+                args.display,
+                args.view,
+                PyOpenColorIO.TRANSFORM_DIR_FORWARD,
+            ).getDefaultCPUProcessor()
+        )
+    else:
+        params = {}
+        if args.parameters is not None:
+            import sweep
+
+            with open(args.parameters) as read_file:
+                params = sweep.normalize_variant(
+                    json.load(read_file), sweep.create_option_names()
+                )
+        engine = image_engine.create_engine(params)
+
+        def transform(chunk, out):
+            engine(chunk, out=out)
+
+    start = time.perf_counter()
+    height, width = process_frame(
+        args.input, args.output, transform, rows=args.rows
+    )
+    print(
+        "Processed {}x{} in {:.2f} s, peak resident {:.0f} MiB".format(
+            width,
+            height,
+            time.perf_counter() - start,
+            peak_resident_megabytes(),
+        )
+    )
+
+    # The streamed frame is held to the lossless processor, as the default
+    # processor approximates the exponents.
+    if args.check is not None:
+        import PyOpenColorIO
+
+        processor = (
+            PyOpenColorIO.Config.CreateFromFile(args.check)
+            .getProcessor(
+                PyOpenColorIO.ROLE_SCENE_LINEAR,
+                args.display,
+                args.view,
+                PyOpenColorIO.TRANSFORM_DIR_FORWARD,
+            )
+            .getOptimizedCPUProcessor(PyOpenColorIO.OPTIMIZATION_LOSSLESS)
+        )
+        print(
+            "Maximum difference to the lossless OpenColorIO processor: "
+            "{:.3g}".format(
+                compare_frame_to_processor(
+                    args.input,
+                    args.output,
+                    processor,
+                    rows=args.rows,
+                )
+            )
+        )
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""sweep
+
+Generate one configuration per parameter variant across a pool of warm worker
+processes, recording each variant and its output in a manifest.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import pathlib
+import time
+import generate_config
+
+manifest_name = "manifest.json"
+
+
+# Map every spelling of a generate_config option, such as "-fs",
+# "--fulcrum_slope" or "fulcrum_slope", to its parameter name.
+def create_option_names():
+    option_names = {}
+    for action in generate_config.create_argparser()._actions:
+        if action.dest in ["help"] + generate_config.nonbuild_parameters:
+            continue
+        option_names[action.dest] = action.dest
+        for option in action.option_strings:
+            option_names[option] = action.dest
+
+    return option_names
+
+
+def normalize_variant(variant, option_names):
+    normalized = {}
+    for option, value in variant.items():
+        if option not in option_names:
+            raise ValueError("Unknown sweep parameter {}.".format(option))
+        normalized[option_names[option]] = value
+
+    return normalized
+
+
+# Expand a sweep description into a list of parameter dictionaries. The
+# description may be a list of variants, or a dictionary holding an explicit
+# "variants" list and / or a "grid" mapping each parameter to its candidate
+# values, with any "base" parameters shared by every variant.
+def expand_sweep(description):
+    option_names = create_option_names()
+
+    if isinstance(description, list):
+        description = {"variants": description}
+
+    base = normalize_variant(description.get("base", {}), option_names)
+    variants = [
+        {**base, **normalize_variant(variant, option_names)}
+        for variant in description.get("variants", [])
+    ]
+
+    grid = normalize_variant(description.get("grid", {}), option_names)
+    if grid:
+        for values in itertools.product(*grid.values()):
+            variants.append({**base, **dict(zip(grid.keys(), values))})
+
+    return variants
+
+
+# Import everything a build needs once per worker, so that each worker stays
+# warm across all of the variants it is handed.
+def initialize_worker():
+    import PyOpenColorIO  # noqa: F401
+    import colour  # noqa: F401
+    import AgX  # noqa: F401
+    import sigmoid  # noqa: F401
+
+
+def build_variant(name, params, output_directory):
+    config, luts = generate_config.build_config(params)
+    variant_directory = pathlib.Path(output_directory) / name
+    files = generate_config.write_config(
+        config, luts, output_directory=variant_directory, verbose=False
+    )
+
+    return name, files
+
+
+# Canonical form of the given subset of the resolved parameters, used to
+# detect variants sharing the same curve or the same gamut.
+def parameter_subset_key(args, parameters):
+    import build_cache
+
+    return json.dumps(
+        {
+            parameter: build_cache.normalize_parameter(
+                getattr(args, parameter)
+            )
+            for parameter in parameters
+        },
+        sort_keys=True,
+    )
+
+
+# Factor the variants into their unique curves and unique gamuts. The curve
+# parameters only influence the LUTs and the gamut parameters only influence
+# the matrices, so each unique curve and gamut need only be calculated once,
+# with every variant assembled from a curve and gamut pair. Returns the
+# unique curves and gamuts as name to parameter dictionaries, along with the
+# curve and gamut name of each variant.
+def plan_sweep(variants):
+    curves = {}
+    gamuts = {}
+    curve_names = {}
+    gamut_names = {}
+    plan = []
+
+    for params in variants:
+        args = generate_config.resolve_parameters(params)
+
+        curve_key = parameter_subset_key(
+            args, generate_config.curve_parameters
+        )
+        if curve_key not in curve_names:
+            curve_names[curve_key] = "curve_{:04d}".format(len(curves))
+            curves[curve_names[curve_key]] = {
+                parameter: getattr(args, parameter)
+                for parameter in generate_config.curve_parameters
+            }
+
+        gamut_key = parameter_subset_key(
+            args, generate_config.gamut_parameters
+        )
+        if gamut_key not in gamut_names:
+            gamut_names[gamut_key] = "gamut_{:04d}".format(len(gamuts))
+            gamuts[gamut_names[gamut_key]] = {
+                parameter: getattr(args, parameter)
+                for parameter in generate_config.gamut_parameters
+            }
+
+        plan.append((curve_names[curve_key], gamut_names[gamut_key]))
+
+    return curves, gamuts, plan
+
+
+def build_curve(name, params, output_directory):
+    luts = generate_config.calculate_LUTs(
+        generate_config.resolve_parameters(params)
+    )
+    files = generate_config.write_LUTs(
+        luts,
+        output_directory,
+        LUTs_directory=pathlib.Path(generate_config.output_LUTs_directory)
+        / name,
+    )
+
+    return name, files
+
+
+def build_gamut(name, params):
+    matrices = generate_config.calculate_matrices(
+        generate_config.resolve_parameters(params)
+    )
+
+    return name, matrices
+
+
+# Assemble a variant configuration that references the LUTs of its curve,
+# shared with every other variant using the same curve.
+def assemble_variant(name, params, curve, matrices, output_directory):
+    import build_cache
+
+    search_path = (
+        pathlib.PurePosixPath("..")
+        / generate_config.output_LUTs_directory
+        / curve
+    )
+    config = generate_config.assemble_config(
+        generate_config.resolve_parameters(params),
+        *matrices,
+        search_paths=[search_path.as_posix()],
+    )
+    config_text = config.serialize()
+
+    def write_config_text(temporary):
+        with open(temporary, "w") as write_file:
+            write_file.write(config_text)
+
+    build_cache.write_file_atomic(
+        pathlib.Path(output_directory)
+        / name
+        / generate_config.output_config_name,
+        write_config_text,
+    )
+
+    return name, [generate_config.output_config_name]
+
+
+def write_manifest(manifest, output_directory):
+    import build_cache
+
+    def write_manifest_text(temporary):
+        with open(temporary, "w") as write_file:
+            json.dump(manifest, write_file, indent=4)
+
+    build_cache.write_file_atomic(
+        pathlib.Path(output_directory) / manifest_name, write_manifest_text
+    )
+
+
+def run_sweep(variants, output_directory, jobs=None, verbose=False):
+    output_directory = pathlib.Path(output_directory)
+    names = ["variant_{:04d}".format(index) for index in range(len(variants))]
+
+    manifest = {
+        name: {"parameters": params, "output": name, "files": None}
+        for name, params in zip(names, variants)
+    }
+
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=initialize_worker
+    ) as executor:
+        futures = [
+            executor.submit(build_variant, name, params, output_directory)
+            for name, params in zip(names, variants)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            name, files = future.result()
+            manifest[name]["files"] = files
+            if verbose is True:
+                print('Built "{}"'.format(name))
+
+    write_manifest(manifest, output_directory)
+
+    if verbose is True:
+        print(
+            "Built {} variants in {:.2f} s".format(
+                len(variants), time.perf_counter() - start
+            )
+        )
+
+    return manifest
+
+
+# Run the sweep factored into its unique curves and gamuts. The LUTs of each
+# unique curve are written once into the shared LUTs directory, and each
+# variant directory holds only a configuration referencing them.
+def run_factorized_sweep(variants, output_directory, jobs=None, verbose=False):
+    output_directory = pathlib.Path(output_directory)
+    names = ["variant_{:04d}".format(index) for index in range(len(variants))]
+    curves, gamuts, plan = plan_sweep(variants)
+
+    manifest = {
+        name: {
+            "parameters": params,
+            "output": name,
+            "curve": curve,
+            "gamut": gamut,
+            "files": None,
+        }
+        for name, params, (curve, gamut) in zip(names, variants, plan)
+    }
+
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=initialize_worker
+    ) as executor:
+        curve_futures = [
+            executor.submit(build_curve, name, params, output_directory)
+            for name, params in curves.items()
+        ]
+        gamut_futures = [
+            executor.submit(build_gamut, name, params)
+            for name, params in gamuts.items()
+        ]
+
+        curve_files = dict(future.result() for future in curve_futures)
+        matrices = dict(future.result() for future in gamut_futures)
+        if verbose is True:
+            print(
+                "Calculated {} curves and {} gamuts".format(
+                    len(curves), len(gamuts)
+                )
+            )
+
+        futures = [
+            executor.submit(
+                assemble_variant,
+                name,
+                params,
+                curve,
+                matrices[gamut],
+                output_directory,
+            )
+            for name, params, (curve, gamut) in zip(names, variants, plan)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            name, files = future.result()
+            curve = manifest[name]["curve"]
+            manifest[name]["files"] = files + [
+                (pathlib.PurePosixPath("..") / filename).as_posix()
+                for filename in curve_files[curve]
+            ]
+            if verbose is True:
+                print('Built "{}"'.format(name))
+
+    write_manifest(manifest, output_directory)
+
+    if verbose is True:
+        print(
+            "Built {} variants in {:.2f} s".format(
+                len(variants), time.perf_counter() - start
+            )
+        )
+
+    return manifest
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Generates one OpenColorIO configuration per variant of "
+        "a parameter sweep",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "sweep",
+        help="JSON sweep description, either a list of variants or an object "
+        'holding "base", "grid" and / or "variants", keyed on the '
+        "generate_config options",
+    )
+    argparser.add_argument(
+        "-o",
+        "--output_directory",
+        help="Directory to write each variant and the manifest to",
+        default="./sweep/",
+    )
+    argparser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of worker processes",
+        type=int,
+        default=os.cpu_count(),
+    )
+    argparser.add_argument(
+        "-i",
+        "--independent",
+        help="Write a self contained configuration and LUTs for every "
+        "variant, rather than sharing the LUTs of identical curves",
+        action="store_true",
+    )
+    args = argparser.parse_args()
+
+    with open(args.sweep) as read_file:
+        variants = expand_sweep(json.load(read_file))
+
+    if args.independent is True:
+        run_sweep(
+            variants, args.output_directory, jobs=args.jobs, verbose=True
+        )
+    else:
+        run_factorized_sweep(
+            variants, args.output_directory, jobs=args.jobs, verbose=True
+        )
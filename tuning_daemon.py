@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""tuning_daemon
+
+Long running generator for interactive tuning. The interpreter and every
+import stay warm, and each change to the parameters re-runs only the stages
+it affects, with the LUTs and then the configuration swapped into place
+atomically. Parameters arrive through a watched JSON or TOML file, or as
+lines of JSON on a localhost socket.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import socketserver
+import threading
+import time
+import generate_config
+import stage_graph
+import sweep
+
+
+# TOML is read by tomllib from Python 3.11, and by tomli before it.
+def import_tomllib():
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ImportError(
+                "Reading TOML parameter files requires Python 3.11 or tomli."
+            )
+
+    return tomllib
+
+
+def load_parameter_file(path):
+    path = pathlib.Path(path)
+    if path.suffix == ".toml":
+        tomllib = import_tomllib()
+
+        with open(path, "rb") as read_file:
+            return tomllib.load(read_file)
+
+    with open(path) as read_file:
+        return json.load(read_file)
+
+
+class RebuildServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class TuningDaemon:
+    def __init__(
+        self,
+        output_directory=generate_config.output_config_directory,
+        stage_directory=None,
+    ):
+        sweep.initialize_worker()
+
+        self.output_directory = output_directory
+        self.graph = stage_graph.create_generator_graph(stage_directory)
+        self.option_names = sweep.create_option_names()
+        self.parameters = {}
+        self.lock = threading.Lock()
+
+    # Rebuild for the given parameters, keyed on any generate_config option
+    # spelling. With update set, the parameters are merged over the current
+    # ones rather than replacing them.
+    def rebuild(self, parameters, update=False):
+        parameters = sweep.normalize_variant(parameters, self.option_names)
+
+        with self.lock:
+            if update is True:
+                parameters = {**self.parameters, **parameters}
+
+            start = time.perf_counter()
+            artifacts, executed = self.graph.run(
+                generate_config.resolve_parameters(parameters),
+                output=self.output_directory,
+            )
+            self.parameters = parameters
+
+        return {
+            "executed": executed,
+            "files": artifacts["write_LUTs"] + artifacts["write_config"],
+            "seconds": time.perf_counter() - start,
+        }
+
+    # Rebuild whenever the parameter file changes, until interrupted.
+    def watch(self, path, interval=0.05, verbose=False):
+        # Fail at once, rather than skipping every change, when TOML cannot
+        # be read at all.
+        if pathlib.Path(path).suffix == ".toml":
+            import_tomllib()
+
+        last_state = None
+        while True:
+            try:
+                stat = os.stat(path)
+                state = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                state = None
+
+            if state is not None and state != last_state:
+                last_state = state
+                try:
+                    report(self.rebuild(load_parameter_file(path)), verbose)
+                except Exception as ex:
+                    # Editors may save partial files, and parameters may fail
+                    # to build, so wait on the next change rather than giving
+                    # up.
+                    print("Skipped {}: {}".format(path, ex))
+
+            time.sleep(interval)
+
+    # Serve rebuilds on a localhost socket. Each line received is a JSON
+    # object of parameters merged over the current ones, answered with a
+    # line of JSON describing the rebuild.
+    def create_server(self, port, verbose=False):
+        daemon = self
+
+        class RebuildHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        result = daemon.rebuild(json.loads(line), update=True)
+                        report(result, verbose)
+                    # Any failure to build, such as an OpenColorIO error
+                    # from a bad parameter, is answered rather than dropping
+                    # the connection.
+                    except Exception as ex:
+                        result = {"error": str(ex)}
+                    self.wfile.write(json.dumps(result).encode("utf-8"))
+                    self.wfile.write(b"\n")
+
+        return RebuildServer(("127.0.0.1", port), RebuildHandler)
+
+
+def report(result, verbose):
+    if verbose is True:
+        print(
+            "Rebuilt in {:.1f} ms, re-ran stages: {}".format(
+                result["seconds"] * 1000.0,
+                ", ".join(result["executed"]) or "none",
+            )
+        )
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Keeps the generator warm, rebuilding the configuration "
+        "whenever the parameters change",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "-p",
+        "--parameter_file",
+        help="JSON or TOML file of generate_config options to watch",
+    )
+    argparser.add_argument(
+        "-l",
+        "--listen",
+        help="Localhost port to accept lines of JSON parameters on",
+        type=int,
+    )
+    argparser.add_argument(
+        "-o",
+        "--output_directory",
+        help="Directory to write the configuration to",
+        default=generate_config.output_config_directory,
+    )
+    argparser.add_argument(
+        "-sd",
+        "--stage_directory",
+        help="Directory to persist the stage artifacts in between sessions",
+        default=None,
+    )
+    argparser.add_argument(
+        "-i",
+        "--interval",
+        help="Seconds between checks of the parameter file",
+        type=float,
+        default=0.05,
+    )
+    args = argparser.parse_args()
+
+    if args.parameter_file is None and args.listen is None:
+        argparser.error("one of --parameter_file or --listen is required")
+
+    daemon = TuningDaemon(args.output_directory, args.stage_directory)
+
+    try:
+        if args.listen is not None:
+            server = daemon.create_server(args.listen, verbose=True)
+            print("Listening on 127.0.0.1:{}".format(args.listen))
+            if args.parameter_file is None:
+                server.serve_forever()
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        print('Watching "{}"'.format(args.parameter_file))
+        daemon.watch(args.parameter_file, args.interval, verbose=True)
+    except KeyboardInterrupt:
+        pass
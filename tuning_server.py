@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""tuning_server
+
+Localhost HTTP endpoint sharing one warm generator between any number of
+tuning interfaces. Bursts of parameter updates are debounced and coalesced
+into a single rebuild, which runs in a worker process so that the event loop
+never blocks. Each response carries the configuration, the LUT bytes and an
+optional preview.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import functools
+import http
+import json
+import multiprocessing
+import pathlib
+import generate_config
+
+# The generator held by the worker process.
+worker_daemon = None
+
+# Exposures of the preview ramp, in stops relative to middle grey.
+preview_stops = (-10.0, 6.0)
+preview_width = 256
+preview_curve_samples = 256
+
+# Rows of the preview ramp, as linear BT.709 chromaticities.
+preview_rows = [
+    [1.0, 1.0, 1.0],
+    [1.0, 0.0, 0.0],
+    [0.0, 1.0, 0.0],
+    [0.0, 0.0, 1.0],
+    [0.0, 1.0, 1.0],
+    [1.0, 0.0, 1.0],
+    [1.0, 1.0, 0.0],
+]
+
+
+def initialize_server_worker(output_directory, stage_directory):
+    import tuning_daemon
+
+    global worker_daemon
+    worker_daemon = tuning_daemon.TuningDaemon(
+        output_directory, stage_directory
+    )
+
+
+def encode_array(array):
+    return {
+        "shape": list(array.shape),
+        "dtype": str(array.dtype),
+        "data": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+# An exposure ramp of each preview row through the AgX view of every
+# display, along with the contrast curve sampled over its domain.
+def render_preview(config_text, output_directory, luts):
+    import PyOpenColorIO
+    import numpy
+
+    config = PyOpenColorIO.Config.CreateFromStream(config_text)
+    config.setWorkingDir(str(pathlib.Path(output_directory).resolve()))
+
+    exposures = 0.18 * numpy.exp2(
+        numpy.linspace(*preview_stops, preview_width, dtype=numpy.float32)
+    )
+    ramp = (
+        numpy.array(preview_rows, dtype=numpy.float32)[:, None, :]
+        * exposures[None, :, None]
+    )
+
+    renders = {}
+    for display in config.getDisplays():
+        processor = config.getProcessor(
+            "Linear BT.709",
+            display,
+            "AgX",
+            PyOpenColorIO.TRANSFORM_DIR_FORWARD,
+        ).getDefaultCPUProcessor()
+        render = ramp.copy()
+        processor.applyRGB(render)
+        renders[display] = encode_array(render)
+
+    curves = {}
+    for LUT_filename, table in luts.items():
+        indices = numpy.linspace(
+            0, len(table) - 1, preview_curve_samples
+        ).astype(int)
+        curves[LUT_filename] = encode_array(
+            numpy.asarray(table, dtype=numpy.float32)[indices]
+        )
+
+    return {"ramps": renders, "curves": curves}
+
+
+def build_in_worker(parameters, preview):
+    result = worker_daemon.rebuild(parameters, update=True)
+    output_directory = pathlib.Path(worker_daemon.output_directory)
+    config_text = worker_daemon.graph.load("config")[1]
+
+    result["parameters"] = worker_daemon.parameters
+    result["config"] = config_text
+    result["luts"] = {
+        filename: base64.b64encode(
+            (output_directory / filename).read_bytes()
+        ).decode("ascii")
+        for filename in result["files"]
+        if filename != generate_config.output_config_name
+    }
+    if preview is True:
+        result["preview"] = render_preview(
+            config_text,
+            output_directory,
+            worker_daemon.graph.load("LUTs")[1],
+        )
+
+    return result
+
+
+# A single worker holds the warm generator and its stage artifacts. It is
+# spawned rather than forked, as forking a process running threads may
+# deadlock the child.
+def create_worker_executor(output_directory, stage_directory):
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initialize_server_worker,
+        initargs=(output_directory, stage_directory),
+    )
+
+
+# Settle a waiter, unless its client has already given up on it.
+def settle(waiter, result=None, exception=None):
+    if waiter.done():
+        return
+
+    if exception is not None:
+        waiter.set_exception(exception)
+    else:
+        waiter.set_result(result)
+
+
+# Coalesce parameter updates arriving within the debounce window of one
+# another into a single rebuild. Updates are merged in arrival order, so that
+# the latest value of each parameter wins, and every request of the window
+# receives the result of that rebuild. Updates arriving during a rebuild are
+# held for the next one.
+class RebuildCoalescer:
+    def __init__(self, create_executor, debounce_seconds=0.05):
+        self.create_executor = create_executor
+        self.executor = create_executor()
+        self.debounce_seconds = debounce_seconds
+        self.requests = []
+        self.built_parameters = {}
+        self.last_update = 0.0
+        self.task = None
+        self.rebuilds = 0
+
+    # Parameters are validated before being merged, so that an invalid
+    # request fails alone rather than failing every request of the window.
+    async def request(self, parameters, preview=False):
+        generate_config.validate_parameters(parameters)
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        self.requests.append((waiter, parameters, preview))
+        self.last_update = loop.time()
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+        return await waiter
+
+    # Build the parameters merged over those of the last successful build.
+    # Should the worker die, taking the warm generator with it, a fresh
+    # worker is started for the next build, which the last built parameters
+    # carry over to.
+    async def build(self, parameters, preview):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor,
+                build_in_worker,
+                {**self.built_parameters, **parameters},
+                preview,
+            )
+        except concurrent.futures.process.BrokenProcessPool:
+            self.executor.shutdown(wait=False)
+            self.executor = self.create_executor()
+            raise
+
+        self.rebuilds += 1
+        self.built_parameters = result["parameters"]
+
+        return result
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while self.requests:
+            remaining = self.last_update + self.debounce_seconds - loop.time()
+            if remaining > 0.0:
+                await asyncio.sleep(remaining)
+                continue
+
+            requests, self.requests = self.requests, []
+
+            parameters = {}
+            for _, request_parameters, _ in requests:
+                parameters.update(request_parameters)
+            preview = any(
+                request_preview for _, _, request_preview in requests
+            )
+
+            try:
+                result = await self.build(parameters, preview)
+            except Exception as ex:
+                if len(requests) == 1:
+                    settle(requests[0][0], exception=ex)
+                    continue
+
+                # Parameters may be valid yet fail to build, so rather than
+                # failing every request of the window, each is retried alone
+                # in arrival order.
+                for waiter, request_parameters, request_preview in requests:
+                    try:
+                        result = await self.build(
+                            request_parameters, request_preview
+                        )
+                    except Exception as ex:
+                        settle(waiter, exception=ex)
+                    else:
+                        settle(waiter, {**result, "coalesced": 1})
+                continue
+
+            result["coalesced"] = len(requests)
+            for waiter, _, _ in requests:
+                settle(waiter, result)
+
+
+class TuningServer:
+    def __init__(
+        self,
+        output_directory=generate_config.output_config_directory,
+        stage_directory=None,
+        debounce_seconds=0.05,
+    ):
+        self.coalescer = RebuildCoalescer(
+            functools.partial(
+                create_worker_executor, output_directory, stage_directory
+            ),
+            debounce_seconds,
+        )
+        self.result = None
+
+    async def route(self, method, path, body):
+        if path == "/build":
+            if method != "POST":
+                return http.HTTPStatus.METHOD_NOT_ALLOWED, {}
+
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object.")
+            self.result = await self.coalescer.request(
+                request.get("parameters", {}),
+                preview=bool(request.get("preview", False)),
+            )
+            return http.HTTPStatus.OK, self.result
+
+        if path == "/status":
+            if method != "GET":
+                return http.HTTPStatus.METHOD_NOT_ALLOWED, {}
+
+            return http.HTTPStatus.OK, {
+                "rebuilds": self.coalescer.rebuilds,
+                "parameters": None
+                if self.result is None
+                else self.result["parameters"],
+            }
+
+        return http.HTTPStatus.NOT_FOUND, {}
+
+    async def respond(self, method, path, body):
+        try:
+            return await self.route(method, path, body)
+        except (ValueError, TypeError) as ex:
+            return http.HTTPStatus.BAD_REQUEST, {"error": str(ex)}
+        except Exception as ex:
+            return http.HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(ex)}
+
+    # Serve HTTP/1.1 requests on the connection until the client closes it or
+    # asks for it to be closed.
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                # A malformed request line or length is answered, closing the
+                # connection, as the rest of the stream cannot be trusted.
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(
+                        " ", 2
+                    )
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError("Negative Content-Length.")
+                except ValueError as ex:
+                    headers["connection"] = "close"
+                    status, response = http.HTTPStatus.BAD_REQUEST, {
+                        "error": "Malformed request: {}".format(ex)
+                    }
+                else:
+                    body = await reader.readexactly(length)
+                    status, response = await self.respond(method, path, body)
+
+                if status != http.HTTPStatus.OK and not response:
+                    response = {"error": status.phrase}
+
+                payload = json.dumps(response).encode("utf-8")
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(
+                    "HTTP/1.1 {} {}\r\n"
+                    "Content-Type: application/json\r\n"
+                    "Content-Length: {}\r\n"
+                    "Connection: {}\r\n\r\n".format(
+                        status.value,
+                        status.phrase,
+                        len(payload),
+                        "close" if close else "keep-alive",
+                    ).encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, port):
+        server = await asyncio.start_server(
+            self.handle_connection, "127.0.0.1", port
+        )
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Serves coalesced rebuilds of the configuration over "
+        "HTTP on localhost",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "-l", "--listen", help="Localhost port", type=int, default=8383
+    )
+    argparser.add_argument(
+        "-o",
+        "--output_directory",
+        help="Directory to write the configuration to",
+        default=generate_config.output_config_directory,
+    )
+    argparser.add_argument(
+        "-sd",
+        "--stage_directory",
+        help="Directory to persist the stage artifacts in between sessions",
+        default=None,
+    )
+    argparser.add_argument(
+        "-d",
+        "--debounce",
+        help="Seconds of quiet before coalesced updates are rebuilt",
+        type=float,
+        default=0.05,
+    )
+    args = argparser.parse_args()
+
+    tuning_server = TuningServer(
+        args.output_directory, args.stage_directory, args.debounce
+    )
+    print("Serving on http://127.0.0.1:{}".format(args.listen))
+    try:
+        asyncio.run(tuning_server.serve(args.listen))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tuning_server.coalescer.executor.shutdown()
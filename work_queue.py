@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""work_queue
+
+Work queue backends for distributed sweeps. A queue holds one unit per
+variant, leased to a single worker at a time. Units whose lease expires, such
+as those held by a killed worker, return to the queue, and completed units
+are never handed out again, so an interrupted sweep resumes where it stopped.
+
+__author__ = Troy James Sobotka
+__copyright__ = Copyright 2023
+__version__ = 1.0
+__maintainer__ = Troy James Sobotka
+__email__ = troy.sobotka@gmail.com
+__status__ = Test
+"""
+
+import abc
+import json
+import pathlib
+import sqlite3
+import time
+
+unit_pending = "pending"
+unit_leased = "leased"
+unit_completed = "completed"
+unit_failed = "failed"
+
+
+# The interface every queue backend provides. Units are dictionaries holding
+# the "name", "shard" and "parameters" of a variant.
+class WorkQueue(abc.ABC):
+    # Add units, leaving any unit already in the queue untouched. A unit named
+    # as one already queued with different parameters raises ValueError,
+    # leaving the queue as it was.
+    @abc.abstractmethod
+    def put(self, units):
+        pass
+
+    # Lease the next available unit, optionally restricted to a shard, or
+    # return None when no unit is available.
+    @abc.abstractmethod
+    def lease(self, worker, shard=None, lease_seconds=600.0):
+        pass
+
+    @abc.abstractmethod
+    def complete(self, name, worker, result):
+        pass
+
+    @abc.abstractmethod
+    def fail(self, name, worker, error):
+        pass
+
+    # Return units leased by the worker to the queue, as when a worker
+    # restarts under the same identity.
+    @abc.abstractmethod
+    def release(self, worker):
+        pass
+
+    # Return failed units to the queue.
+    @abc.abstractmethod
+    def retry_failed(self):
+        pass
+
+    # Counts of units in each state.
+    @abc.abstractmethod
+    def progress(self):
+        pass
+
+    # Every unit along with its state and result.
+    @abc.abstractmethod
+    def units(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    def __init__(self, path, timeout=60.0):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Transactions are managed explicitly, so that leasing takes the
+        # write lock before reading.
+        self.connection = sqlite3.connect(
+            str(self.path), timeout=timeout, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS units ("
+            "name TEXT PRIMARY KEY, "
+            "sequence INTEGER NOT NULL, "
+            "shard INTEGER NOT NULL, "
+            "parameters TEXT NOT NULL, "
+            "state TEXT NOT NULL, "
+            "worker TEXT, "
+            "lease_expiry REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT, "
+            "error TEXT)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS units_state "
+            "ON units (state, shard, sequence)"
+        )
+
+    def transaction(self):
+        return SQLiteTransaction(self.connection)
+
+    def put(self, units):
+        with self.transaction():
+            (sequence,) = self.connection.execute(
+                "SELECT COUNT(*) FROM units"
+            ).fetchone()
+            for offset, unit in enumerate(units):
+                parameters = json.dumps(unit["parameters"], sort_keys=True)
+                inserted = self.connection.execute(
+                    "INSERT OR IGNORE INTO units "
+                    "(name, sequence, shard, parameters, state) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        unit["name"],
+                        sequence + offset,
+                        unit["shard"],
+                        parameters,
+                        unit_pending,
+                    ),
+                ).rowcount
+                if inserted == 0:
+                    (existing,) = self.connection.execute(
+                        "SELECT parameters FROM units WHERE name = ?",
+                        (unit["name"],),
+                    ).fetchone()
+                    if json.loads(existing) != json.loads(parameters):
+                        raise ValueError(
+                            "Unit {} is already queued with different "
+                            "parameters.".format(unit["name"])
+                        )
+
+    def lease(self, worker, shard=None, lease_seconds=600.0):
+        now = time.time()
+        query = (
+            "SELECT name, shard, parameters FROM units "
+            "WHERE (state = ? OR (state = ? AND lease_expiry < ?))"
+        )
+        arguments = [unit_pending, unit_leased, now]
+        if shard is not None:
+            query += " AND shard = ?"
+            arguments.append(shard)
+        query += " ORDER BY sequence LIMIT 1"
+
+        with self.transaction():
+            row = self.connection.execute(query, arguments).fetchone()
+            if row is None:
+                return None
+
+            name, shard, parameters = row
+            self.connection.execute(
+                "UPDATE units SET state = ?, worker = ?, lease_expiry = ?, "
+                "attempts = attempts + 1 WHERE name = ?",
+                (unit_leased, worker, now + lease_seconds, name),
+            )
+
+        return {
+            "name": name,
+            "shard": shard,
+            "parameters": json.loads(parameters),
+        }
+
+    # Only the worker holding the lease may settle a unit, so that a worker
+    # whose lease expired cannot overwrite the unit of its successor.
+    def settle(self, name, worker, state, result=None, error=None):
+        with self.transaction():
+            cursor = self.connection.execute(
+                "UPDATE units SET state = ?, result = ?, error = ?, "
+                "lease_expiry = NULL "
+                "WHERE name = ? AND worker = ? AND state = ?",
+                (
+                    state,
+                    None if result is None else json.dumps(result),
+                    error,
+                    name,
+                    worker,
+                    unit_leased,
+                ),
+            )
+
+        return cursor.rowcount == 1
+
+    def complete(self, name, worker, result):
+        return self.settle(name, worker, unit_completed, result=result)
+
+    def fail(self, name, worker, error):
+        return self.settle(name, worker, unit_failed, error=error)
+
+    def release(self, worker):
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE units SET state = ?, lease_expiry = NULL "
+                "WHERE worker = ? AND state = ?",
+                (unit_pending, worker, unit_leased),
+            )
+
+    # Return failed units to the queue for another attempt.
+    def retry_failed(self):
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE units SET state = ?, error = NULL WHERE state = ?",
+                (unit_pending, unit_failed),
+            )
+
+    def progress(self):
+        counts = {
+            state: 0
+            for state in [
+                unit_pending,
+                unit_leased,
+                unit_completed,
+                unit_failed,
+            ]
+        }
+        for state, count in self.connection.execute(
+            "SELECT state, COUNT(*) FROM units GROUP BY state"
+        ):
+            counts[state] = count
+
+        return counts
+
+    def units(self):
+        units = []
+        for row in self.connection.execute(
+            "SELECT name, shard, parameters, state, worker, attempts, "
+            "result, error FROM units ORDER BY sequence"
+        ):
+            (
+                name,
+                shard,
+                parameters,
+                state,
+                worker,
+                attempts,
+                result,
+                error,
+            ) = row
+            units.append(
+                {
+                    "name": name,
+                    "shard": shard,
+                    "parameters": json.loads(parameters),
+                    "state": state,
+                    "worker": worker,
+                    "attempts": attempts,
+                    "result": None if result is None else json.loads(result),
+                    "error": error,
+                }
+            )
+
+        return units
+
+    def close(self):
+        self.connection.close()
+
+
+class SQLiteTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+
+
+queue_backends = {"sqlite": SQLiteWorkQueue}
+
+
+# Open a queue from a location such as "sqlite:///path/to/queue.sqlite". A
+# location without a scheme is taken to be an SQLite database path.
+def open_queue(location):
+    scheme, separator, path = location.partition("://")
+    if not separator:
+        scheme, path = "sqlite", location
+    if scheme not in queue_backends:
+        raise ValueError("Unknown work queue backend {}.".format(scheme))
+
+    return queue_backends[scheme](path)
@@ -13,11 +13,124 @@ __status__ = Test
 """
 
 import colour
+import memoize
 import numpy
-import shapely
-import shapely.affinity
 
+# Arbitrary distance, relative to the achromatic coordinate, used to push the
+# primaries and the tinting direction safely beyond the source gamut.
+arbitrary_scale = 4.0
 
+
+def cross_2d(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+# Scale coordinates about an origin, as per shapely.affinity.scale.
+def scale_coordinates(coordinates, factor, origin):
+    factor = numpy.asarray(factor)[..., numpy.newaxis]
+
+    return origin + factor * (coordinates - origin)
+
+
+# Rotate coordinates about an origin in degrees, positive values counter
+# clockwise, as per shapely.affinity.rotate.
+def rotate_coordinates(coordinates, degrees, origin):
+    radians = numpy.radians(degrees)
+    cosine = numpy.cos(radians)
+    sine = numpy.sin(radians)
+    offset = coordinates - origin
+
+    return origin + numpy.stack(
+        [
+            cosine * offset[..., 0] - sine * offset[..., 1],
+            sine * offset[..., 0] + cosine * offset[..., 1],
+        ],
+        axis=-1,
+    )
+
+
+# Intersect the segments running from each of the outer coordinates toward
+# an origin within the hull with the hull boundary. Outer coordinates already
+# within the hull are returned as is, as with a shapely intersection.
+def intersect_hull(coordinates, origin, hull):
+    hull = numpy.asarray(hull, dtype=numpy.float64)
+    edges = numpy.roll(hull, -1, axis=0) - hull
+
+    direction = (coordinates - origin)[..., numpy.newaxis, :]
+    offset = hull - origin[..., numpy.newaxis, :]
+
+    denominator = cross_2d(direction, edges)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        distance = cross_2d(offset, edges) / denominator
+        position = cross_2d(offset, direction) / denominator
+
+    tolerance = 1e-12
+    valid = (
+        (denominator != 0.0)
+        & (distance >= 0.0)
+        & (position >= -tolerance)
+        & (position <= 1.0 + tolerance)
+    )
+    distance = numpy.minimum(
+        numpy.where(valid, distance, numpy.inf).min(axis=-1), 1.0
+    )
+
+    return origin + distance[..., numpy.newaxis] * (coordinates - origin)
+
+
+# Pure NumPy rotate, hull intersection and inset / outset of the primaries and
+# achromatic coordinate. Any leading axes of the adjustments are carried
+# through to the returned primaries and whitepoint.
+def calculate_workingspace(
+    primaries_rotate=[1.75, -0.5, -1.0],
+    primaries_scale=[0.15, 0.15, 0.10],
+    achromatic_rotate=0.0,
+    achromatic_outset=0.0,
+    colourspace_in=colour.RGB_COLOURSPACES["ITU-R BT.709"],
+):
+    primaries_rotate = numpy.asarray(primaries_rotate, dtype=numpy.float64)
+    primaries_scale = numpy.asarray(primaries_scale, dtype=numpy.float64)
+    achromatic_rotate = numpy.asarray(achromatic_rotate, dtype=numpy.float64)
+    achromatic_outset = numpy.asarray(achromatic_outset, dtype=numpy.float64)
+
+    primaries = numpy.asarray(colourspace_in.primaries, dtype=numpy.float64)
+    achromatic = numpy.asarray(colourspace_in.whitepoint, dtype=numpy.float64)
+
+    # Scale the primaries outward to cover the totality of the target
+    # geometry, and place the tinting direction above the achromatic
+    # coordinate.
+    scaled_primaries = scale_coordinates(
+        primaries, arbitrary_scale, achromatic
+    )
+    scaled_achromatic = numpy.array(
+        [achromatic[0], achromatic[1] * arbitrary_scale]
+    )
+
+    # Rotate the primaries. Positive values are counter clockwise.
+    rotated_primaries = rotate_coordinates(
+        scaled_primaries, primaries_rotate, achromatic
+    )
+    rotated_achromatic = rotate_coordinates(
+        scaled_achromatic, achromatic_rotate, achromatic
+    )
+
+    # Calculate the intersections with the working space chosen.
+    hull_primaries = intersect_hull(rotated_primaries, achromatic, primaries)
+    hull_achromatic = intersect_hull(rotated_achromatic, achromatic, primaries)
+
+    # Inset according to the desired inset scales. Insetting controls the rate
+    # of attenuation.
+    primaries_inset = scale_coordinates(
+        hull_primaries, 1.0 - primaries_scale, achromatic
+    )
+    achromatic_outset_coordinates = scale_coordinates(
+        achromatic, 1.0 - achromatic_outset, hull_achromatic
+    )
+
+    return primaries_inset, achromatic_outset_coordinates
+
+
+@memoize.memoize()
 def create_workingspace(
     primaries_rotate=[1.75, -0.5, -1.0],
     primaries_scale=[0.15, 0.15, 0.10],
@@ -26,12 +139,110 @@ def create_workingspace(
     colourspace_in=colour.RGB_COLOURSPACES["ITU-R BT.709"],
     name="No name set",
 ):
+    primaries_inset, achromatic_outset_coordinates = calculate_workingspace(
+        primaries_rotate=primaries_rotate,
+        primaries_scale=primaries_scale,
+        achromatic_rotate=achromatic_rotate,
+        achromatic_outset=achromatic_outset,
+        colourspace_in=colourspace_in,
+    )
+
+    colourspace = colour.RGB_Colourspace(
+        name=name,
+        primaries=primaries_inset,
+        whitepoint=achromatic_outset_coordinates,
+        whitepoint_name=colourspace_in.whitepoint_name,
+        cctf_encoding=colourspace_in.cctf_encoding,
+        cctf_decoding=colourspace_in.cctf_decoding,
+        use_derived_matrix_RGB_to_XYZ=True,
+        use_derived_matrix_XYZ_to_RGB=True,
+    )
+
+    return colourspace
+
+
+# Normalised primary matrices for stacks of primaries and whitepoints, as per
+# colour.normalised_primary_matrix.
+def calculate_normalised_primary_matrix(primaries, whitepoint):
+    primaries = numpy.asarray(primaries, dtype=numpy.float64)
+    whitepoint = numpy.asarray(whitepoint, dtype=numpy.float64)
+
+    # Columns of the CIE XYZ tristimulus values of each primary at Y = 1.
+    primaries_XYZ = numpy.stack(
+        [
+            primaries[..., 0] / primaries[..., 1],
+            numpy.ones(primaries.shape[:-1]),
+            (1.0 - primaries[..., 0] - primaries[..., 1]) / primaries[..., 1],
+        ],
+        axis=-2,
+    )
+    whitepoint_XYZ = numpy.stack(
+        [
+            whitepoint[..., 0] / whitepoint[..., 1],
+            numpy.ones(whitepoint.shape[:-1]),
+            (1.0 - whitepoint[..., 0] - whitepoint[..., 1])
+            / whitepoint[..., 1],
+        ],
+        axis=-1,
+    )
+
+    coefficients = numpy.linalg.solve(
+        primaries_XYZ, whitepoint_XYZ[..., numpy.newaxis]
+    )
+
+    return primaries_XYZ * numpy.swapaxes(coefficients, -1, -2)
+
+
+# Batched sibling of create_workingspace. Given adjustments of shape (N, 3)
+# for the primaries and (N,) for the achromatic coordinate, returns the
+# primaries (N, 3, 2), whitepoints (N, 2), and the RGB to XYZ and XYZ to RGB
+# matrices (N, 3, 3) without constructing any colourspace objects.
+def calculate_workingspace_batch(
+    primaries_rotate,
+    primaries_scale,
+    achromatic_rotate,
+    achromatic_outset,
+    colourspace_in=colour.RGB_COLOURSPACES["ITU-R BT.709"],
+):
+    primaries, whitepoints = calculate_workingspace(
+        primaries_rotate=primaries_rotate,
+        primaries_scale=primaries_scale,
+        achromatic_rotate=achromatic_rotate,
+        achromatic_outset=achromatic_outset,
+        colourspace_in=colourspace_in,
+    )
+
+    # Expand any shared adjustments out to the full batch.
+    batch_shape = numpy.broadcast_shapes(
+        primaries.shape[:-2], whitepoints.shape[:-1]
+    )
+    primaries = numpy.broadcast_to(primaries, batch_shape + (3, 2))
+    whitepoints = numpy.broadcast_to(whitepoints, batch_shape + (2,))
+
+    matrix_RGB_to_XYZ = calculate_normalised_primary_matrix(
+        primaries, whitepoints
+    )
+    matrix_XYZ_to_RGB = numpy.linalg.inv(matrix_RGB_to_XYZ)
+
+    return primaries, whitepoints, matrix_RGB_to_XYZ, matrix_XYZ_to_RGB
+
+
+# The original shapely construction, retained as the reference for
+# calculate_workingspace. Shapely is only required when this is called.
+def calculate_workingspace_shapely(
+    primaries_rotate=[1.75, -0.5, -1.0],
+    primaries_scale=[0.15, 0.15, 0.10],
+    achromatic_rotate=0.0,
+    achromatic_outset=0.0,
+    colourspace_in=colour.RGB_COLOURSPACES["ITU-R BT.709"],
+):
+    import shapely
+    import shapely.affinity
+
     #####
     # Construct the Base Image Formation Colourspace
     #####
 
-    arbitrary_scale = 4.0
-
     point_red = shapely.Point(colourspace_in.primaries[0])
     point_green = shapely.Point(colourspace_in.primaries[1])
     point_blue = shapely.Point(colourspace_in.primaries[2])
@@ -158,12 +369,13 @@ def create_workingspace(
         origin=hull_achromatic,
     )
 
-    primaries_inset = numpy.asarray(
+    primaries_inset = numpy.reshape(
         [
             rotated_inset_red.coords,
             rotated_inset_green.coords,
             rotated_inset_blue.coords,
-        ]
+        ],
+        (3, 2),
     )
 
     achromatic_outset_coordinates = numpy.asarray(
@@ -173,15 +385,4 @@ def create_workingspace(
         ]
     )
 
-    colourspace = colour.RGB_Colourspace(
-        name=name,
-        primaries=primaries_inset,
-        whitepoint=achromatic_outset_coordinates,
-        whitepoint_name=colourspace_in.whitepoint_name,
-        cctf_encoding=colourspace_in.cctf_encoding,
-        cctf_decoding=colourspace_in.cctf_decoding,
-        use_derived_matrix_RGB_to_XYZ=True,
-        use_derived_matrix_XYZ_to_RGB=True,
-    )
-
-    return colourspace
+    return primaries_inset, achromatic_outset_coordinates